@@ -1,23 +1,66 @@
 #!/usr/bin/env python3
-"""Check if documentation is in sync with inputs."""
+"""Check if documentation is in sync with inputs.
 
+With no arguments every tracked file is checked in the working tree. When
+pre-commit passes the staged filenames, only the mappings using those files
+are checked, against their staged content.
+"""
+
+import argparse
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from tracking_manager.utils import check_files_in_sync
+from tracking_manager.models import TrackingData
+from tracking_manager.utils import (
+    TRACKING_FILE,
+    StagedHasher,
+    iter_sync_issues,
+    load_tracking_data,
+    normalize_path,
+    parse_tracking_document,
+    select_mappings,
+)
 
 
 def main():
     """Check synchronization and exit with appropriate code."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("filenames", nargs="*", help="Staged files to check (from pre-commit)")
+    args = parser.parse_args()
+
     print("Checking documentation synchronization...")
 
-    in_sync, issues = check_files_in_sync()
+    try:
+        if args.filenames:
+            hasher = StagedHasher()
+            staged = hasher.read(Path(TRACKING_FILE))
+            if staged is not None:
+                data = TrackingData.model_validate(parse_tracking_document(staged))
+            else:
+                data = load_tracking_data()
+
+            mappings = data.last_generation.mappings
+            if TRACKING_FILE not in {normalize_path(f) for f in args.filenames}:
+                mappings = select_mappings(mappings, args.filenames)
+            if not mappings:
+                print("✓ No tracked files staged")
+                return 0
+        else:
+            # Stream mappings from the file rather than loading it whole
+            hasher = None
+            mappings = None
+    except Exception as e:
+        print(f"✗ Error checking sync: {e}", file=sys.stderr)
+        return 1
+
+    issues = [str(issue) for issue in iter_sync_issues(mappings, hasher)]
 
-    if in_sync:
-        print("✓ All tracked files are in sync")
+    if not issues:
+        checked = f" ({len(mappings)} mapping(s) checked)" if mappings is not None else ""
+        print(f"✓ All tracked files are in sync{checked}")
         return 0
     else:
         print(f"✗ Found {len(issues)} issue(s):", file=sys.stderr)
@@ -1,20 +1,30 @@
 #!/usr/bin/env python3
-"""Validate tracking file for pre-commit hook."""
+"""Validate tracking file for pre-commit hook.
 
+When pre-commit passes filenames, the staged version of the tracking file is
+validated rather than the working tree copy.
+"""
+
+import argparse
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from tracking_manager.utils import validate_tracking_file
+from tracking_manager.utils import TRACKING_FILE, StagedHasher, validate_tracking_file
 
 
 def main():
     """Run validation and exit with appropriate code."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("filenames", nargs="*", help="Staged files (from pre-commit)")
+    args = parser.parse_args()
+
     print("Validating tracking file...")
 
-    is_valid, error = validate_tracking_file()
+    content = StagedHasher().read(Path(TRACKING_FILE)) if args.filenames else None
+    is_valid, error = validate_tracking_file(content)
 
     if is_valid:
         print("✓ Tracking file is valid")
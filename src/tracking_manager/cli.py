@@ -1,166 +1,246 @@
-"""CLI for documentation tracking management."""
+"""CLI for documentation tracking management.
 
+Commands that can query a ``track serve`` server import the tracking modules
+(pydantic, GitPython, jsonschema) only when they run locally, so a query
+over --socket starts with the standard library and click alone.
+"""
+
+import json
+import sys
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
 import click
 
-from .models import Generation, HistoryEntry, Mapping, TrackingData
-from .utils import (
-    check_files_in_sync,
-    format_timestamp,
-    get_current_commit,
-    hash_file,
-    load_tracking_data,
-    save_tracking_data,
-    validate_tracking_file,
-)
+from .client import DEFAULT_SOCKET, query
+from .fragments import split_fragment
+from .gitrefs import is_git_ref
 
 
 @click.group()
 @click.version_option(version="1.0.0")
-def cli():
+@click.option(
+    "--socket",
+    "socket_path",
+    envvar="TRACK_SOCKET",
+    type=click.Path(dir_okay=False),
+    help="Query a running 'track serve' server instead of working locally",
+)
+@click.pass_context
+def cli(ctx: click.Context, socket_path: Optional[str]):
     """Documentation tracking and validation system."""
-    pass
+    ctx.obj = {"socket": socket_path}
+
+
+format_option = click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "json", "ndjson"]),
+    default="text",
+    show_default=True,
+    help="Output format (json and ndjson are machine-readable)",
+)
+
+
+def _emit(record: dict, pretty: bool = False) -> None:
+    """Write a JSON record to stdout, one line per record unless pretty."""
+    click.echo(json.dumps(record, indent=2 if pretty else None, default=str))
+
+
+def _local_issues(mappings: Optional[list] = None) -> Iterator[dict]:
+    """Check tracked files locally, yielding each sync issue as a JSON record."""
+    from .utils import iter_sync_issues
+
+    for issue in iter_sync_issues(mappings):
+        yield issue.model_dump(mode="json", exclude_none=True)
+
+
+def _report_issues(issues: Iterable[dict], output_format: str, fail_fast: bool) -> list[dict]:
+    """Consume sync issue records, streaming each one as soon as it is found.
+
+    Text issues go to stderr and ndjson issues are emitted one record per line;
+    json output is collected and returned for a single document at the end.
+    """
+    found = []
+    for record in issues:
+        found.append(record)
+
+        if output_format == "ndjson":
+            _emit({"event": "issue", **record})
+        elif output_format == "text":
+            click.echo(f"  - {record['message']}", err=True)
+
+        if fail_fast:
+            break
+
+    return found
+
+
+def _remote(method: str, params: dict) -> Optional[dict]:
+    """Send a query to the server given with --socket, or return None to run locally."""
+    socket_path = (click.get_current_context().obj or {}).get("socket")
+    if not socket_path:
+        return None
+    try:
+        return query(method, params, socket_path=socket_path)
+    except OSError as e:
+        click.echo(f"✗ Cannot reach server at {socket_path}: {e}", err=True)
+        raise click.Abort()
+    except RuntimeError as e:
+        click.echo(f"✗ Error: {e}", err=True)
+        raise click.Abort()
+
+
+def _tracked_path(path: str) -> str:
+    """Normalize a path given on the command line, keeping any fragment."""
+    if is_git_ref(path):
+        return path
+    base, fragment = split_fragment(path)
+    return str(Path(base)) + (f"#{fragment}" if fragment is not None else "")
 
 
 @cli.command()
-@click.argument("input_files", nargs=-1, required=True, type=click.Path(exists=True))
+@click.argument("input_files", nargs=-1, required=True)
 @click.option("--output", "-o", "output_files", multiple=True, required=True, type=click.Path(), help="Output file path(s)")
 @click.option("--description", "-d", required=True, help="Description of the transformation")
 @click.option("--generator", "-g", default="warp-ai", help="Generator tool name")
 @click.option("--with-hash", is_flag=True, help="Include file hashes in tracking")
-def track(input_files: tuple[str, ...], output_files: tuple[str, ...], description: str, generator: str, with_hash: bool):
+@click.option(
+    "--hash-mode",
+    type=click.Choice(["sha256", "git-blob"]),
+    default="sha256",
+    show_default=True,
+    help="Hash algorithm; git-blob reuses blob IDs from the git index",
+)
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0),
+    help="Generation time in seconds, recorded in the mapping's metrics",
+)
+def track(
+    input_files: tuple[str, ...],
+    output_files: tuple[str, ...],
+    description: str,
+    generator: str,
+    with_hash: bool,
+    hash_mode: str,
+    duration: Optional[float],
+):
     """Track a new input-output mapping.
     
     Supports both single and multiple input/output files.
     
+    Inputs may address a Markdown section or CSV row with a fragment
+    (file.md#heading-slug, file.csv#key) so that only edits to that part of
+    the file make the mapping stale.
+
+    Inputs of the form git+<url>@<ref> track an upstream repository by the
+    commit its ref resolves to.
+
     Examples:
       track input.csv -o output.md -d "Generate docs"
       track file1.csv file2.json -o out1.md -o out2.md -d "Multi-file transform"
+      track docs/catalog.md#json-schema -o guide.md -d "Guide from one section"
+      track git+https://github.com/jgraph/drawio.git@dev -o docs/tools-catalog.md -d "Catalog"
     """
     try:
-        # Convert tuples to lists
-        input_list = list(input_files)
-        output_list = list(output_files)
-        
-        # Load existing tracking data or create new
-        try:
-            data = load_tracking_data()
-        except FileNotFoundError:
-            click.echo("Creating new tracking file...")
-            data = TrackingData(
-                version="1.0.0",
-                last_generation=Generation(
-                    commit_id=get_current_commit(),
-                    timestamp=datetime.now(),
-                    generator=generator,
-                    mappings=[],
-                ),
-                history=[],
-            )
-
-        # Create new mapping with multiple files
-        input_paths = [Path(f) for f in input_list]
-        output_paths = [Path(f) for f in output_list]
+        # Convert tuples to lists of normalized paths, keeping any fragment
+        input_list = [_tracked_path(f) for f in input_files]
+        output_list = [_tracked_path(f) for f in output_files]
+        params = {
+            "inputs": input_list,
+            "outputs": output_list,
+            "description": description,
+            "generator": generator,
+            "hash_mode": hash_mode if with_hash else None,
+            "duration": duration,
+        }
+
+        result = _remote("track", params)
+        if result is not None:
+            commit_id = result["commit_id"]
+        else:
+            from .utils import load_tracking_data, record_mapping, save_tracking_data
 
-        mapping = Mapping(
-            inputs=[str(p) for p in input_paths],
-            outputs=[str(p) for p in output_paths],
-            description=description,
-        )
+            # Load existing tracking data or create new
+            try:
+                data = load_tracking_data()
+            except FileNotFoundError:
+                click.echo("Creating new tracking file...")
+                data = None
 
-        if with_hash:
-            input_hashes = {}
-            output_hashes = {}
-            
-            for input_path in input_paths:
-                if input_path.exists():
-                    input_hashes[str(input_path)] = hash_file(input_path)
-            
-            for output_path in output_paths:
-                if output_path.exists():
-                    output_hashes[str(output_path)] = hash_file(output_path)
-            
-            if input_hashes:
-                mapping.input_hashes = input_hashes
-            if output_hashes:
-                mapping.output_hashes = output_hashes
-
-        # Update tracking data
-        commit_id = get_current_commit()
-        timestamp = datetime.now()
-
-        # Format file lists for history
-        input_str = ", ".join(input_list)
-        output_str = ", ".join(output_list)
-        change_msg = f"Added mapping: [{input_str}] -> [{output_str}]"
-
-        # Add to history
-        data.history.append(
-            HistoryEntry(
-                commit_id=commit_id,
-                timestamp=timestamp,
-                version=data.version,
-                changes=[change_msg],
-            )
-        )
-
-        # Update last generation
-        data.last_generation = Generation(
-            commit_id=commit_id,
-            timestamp=timestamp,
-            generator=generator,
-            mappings=data.last_generation.mappings + [mapping],
-        )
+            data, _ = record_mapping(data, **params)
+            save_tracking_data(data)
+            commit_id = data.last_generation.commit_id
 
-        save_tracking_data(data)
         click.echo(f"✓ Tracked mapping:")
-        click.echo(f"  Inputs:  {input_str}")
-        click.echo(f"  Outputs: {output_str}")
+        click.echo(f"  Inputs:  {', '.join(input_list)}")
+        click.echo(f"  Outputs: {', '.join(output_list)}")
         click.echo(f"  Commit:  {commit_id}")
 
+    except click.Abort:
+        raise
     except Exception as e:
         click.echo(f"✗ Error: {e}", err=True)
         raise click.Abort()
 
 
 @cli.command()
-def validate():
+@format_option
+def validate(output_format: str):
     """Validate tracking file against schema."""
-    click.echo("Validating tracking file...")
+    from .utils import validate_tracking_file
+
+    if output_format == "text":
+        click.echo("Validating tracking file...")
 
     is_valid, error = validate_tracking_file()
 
-    if is_valid:
+    if output_format == "json":
+        _emit({"valid": is_valid, "error": error}, pretty=True)
+    elif output_format == "ndjson":
+        _emit({"event": "result", "valid": is_valid, "error": error})
+    elif is_valid:
         click.echo("✓ Tracking file is valid")
-        return 0
     else:
         click.echo(f"✗ Validation failed: {error}", err=True)
-        return 1
+
+    if not is_valid:
+        sys.exit(1)
 
 
 @cli.command()
-def sync():
+@format_option
+@click.option("--fail-fast", is_flag=True, help="Stop at the first out-of-sync file")
+def sync(output_format: str, fail_fast: bool):
     """Check if tracked files are in sync."""
-    click.echo("Checking file synchronization...")
-
-    in_sync, issues = check_files_in_sync()
-
-    if in_sync:
+    if output_format == "text":
+        click.echo("Checking file synchronization...")
+
+    result = _remote("sync", {"fail_fast": fail_fast})
+    found = result["issues"] if result is not None else _local_issues()
+    issues = _report_issues(found, output_format, fail_fast)
+
+    if output_format == "json":
+        _emit({"in_sync": not issues, "issues": issues}, pretty=True)
+    elif output_format == "ndjson":
+        _emit({"event": "result", "in_sync": not issues, "issue_count": len(issues)})
+    elif not issues:
         click.echo("✓ All tracked files are in sync")
-        return 0
     else:
-        click.echo(f"✗ Found {len(issues)} issue(s):", err=True)
-        for issue in issues:
-            click.echo(f"  - {issue}", err=True)
-        return 1
+        click.echo(f"✗ Found {len(issues)} issue(s)", err=True)
+
+    if issues:
+        sys.exit(1)
 
 
 @cli.command()
 @click.option("--limit", "-n", default=10, help="Number of entries to show")
 def history(limit: int):
     """Show tracking history."""
+    from .utils import format_timestamp, load_tracking_data
+
     try:
         data = load_tracking_data()
 
@@ -187,20 +267,184 @@ def history(limit: int):
 
 
 @cli.command()
-def migrate():
-    """Migrate tracking file from old single-file format to new multi-file format.
+@click.argument("paths", nargs=-1)
+@format_option
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0),
+    help="Generation time in seconds, recorded in the mapping's metrics",
+)
+def refresh(paths: tuple[str, ...], output_format: str, duration: Optional[float]):
+    """Update stored hashes after regenerating files.
+
+    Rehashes the inputs and outputs of hashed mappings (only those using
+    PATHS, if given). Hashes are updated in place, with one history entry,
+    only for mappings whose outputs changed or are named in PATHS; mappings
+    with edited inputs but untouched outputs are reported as stale and left
+    as they are. Digests are cached by file stat data in .docs-tracking-cache/,
+    so only files that changed since the last run are read. File sizes and
+    hashing time are recorded in the refreshed mappings' metrics.
+    """
+    selected = [_tracked_path(p) for p in paths] or None
+    result = _remote("refresh", {"paths": selected, "duration": duration})
+    if result is None:
+        from .utils import (
+            STAT_CACHE_FILE,
+            CachedHasher,
+            load_tracking_data,
+            refresh_hashes,
+            refresh_report,
+            save_tracking_data,
+        )
+
+        try:
+            data = load_tracking_data()
+        except FileNotFoundError:
+            click.echo("✗ No tracking file found", err=True)
+            raise click.Abort()
+
+        try:
+            hasher = CachedHasher(cache_path=Path(STAT_CACHE_FILE))
+            refreshed, stale = refresh_hashes(data, selected, hasher, duration=duration)
+            if refreshed:
+                save_tracking_data(data)
+            hasher.save()
+        except Exception as e:
+            click.echo(f"✗ Error: {e}", err=True)
+            raise click.Abort()
+        result = refresh_report(data, refreshed, stale)
+
+    if output_format == "json":
+        _emit(result, pretty=True)
+        return
+    if output_format == "ndjson":
+        for record in result["mappings"]:
+            _emit({"event": "refreshed", **record})
+        for record in result["stale"]:
+            _emit({"event": "stale", **record})
+        return
+
+    for record in result["stale"]:
+        inputs_str = ", ".join(record["inputs"])
+        outputs_str = ", ".join(record["outputs"])
+        click.echo(
+            f"⚠ Not refreshed, outputs not regenerated: [{inputs_str}] -> [{outputs_str}]",
+            err=True,
+        )
+        for path in record["changed"]:
+            click.echo(f"     changed {path}", err=True)
+
+    if not result["mappings"]:
+        if not result["stale"]:
+            click.echo("✓ Stored hashes are up to date")
+    else:
+        count = len(result["mappings"])
+        click.echo(f"✓ Refreshed {count} mapping(s) (commit: {result['commit_id']})")
+        for record in result["mappings"]:
+            inputs_str = ", ".join(record["inputs"])
+            outputs_str = ", ".join(record["outputs"])
+            click.echo(f"  {record['index'] + 1}. [{inputs_str}] -> [{outputs_str}]")
+            for path in record["changed"]:
+                click.echo(f"     updated {path}")
+
+
+@cli.command()
+@click.option(
+    "--top", "-n", default=5, show_default=True, help="Number of slowest mappings to list"
+)
+@format_option
+def stats(top: int, output_format: str):
+    """Show generation cost metrics of the tracked mappings.
+
+    Reports percentiles of generation time, hashing time, file sizes and
+    regeneration counts, the slowest mappings, and the out-of-sync mappings
+    in rebuild order: longest-running first, so parallel rebuilds finish
+    sooner.
+    """
+    from .utils import load_tracking_data, mapping_stats, rebuild_order
+
+    try:
+        mappings = load_tracking_data().last_generation.mappings
+    except FileNotFoundError:
+        click.echo("✗ No tracking file found", err=True)
+        raise click.Abort()
+
+    result = mapping_stats(mappings, top)
+    result["rebuild_order"] = [
+        {
+            "index": position,
+            "inputs": mappings[position].inputs,
+            "outputs": mappings[position].outputs,
+        }
+        for position in rebuild_order(mappings)
+    ]
+
+    if output_format == "json":
+        _emit(result, pretty=True)
+        return
+    if output_format == "ndjson":
+        for field, summary in result["metrics"].items():
+            _emit({"event": "metric", "field": field, **summary})
+        for record in result["slowest"]:
+            _emit({"event": "slowest", **record})
+        for record in result["rebuild_order"]:
+            _emit({"event": "stale", **record})
+        return
+
+    click.echo(f"\n{'='*70}")
+    click.echo("Mapping Metrics")
+    click.echo(f"{'='*70}\n")
+
+    click.echo(f"Mappings with metrics: {result['with_metrics']}/{result['total_mappings']}")
+    if result["metrics"]:
+        click.echo(f"\n  {'metric':<18}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for field, summary in result["metrics"].items():
+            values = "".join(f"{summary[key]:>10.4g}" for key in ("p50", "p90", "p99", "max"))
+            click.echo(f"  {field:<18}{values}")
+
+    if result["slowest"]:
+        click.echo("\nSlowest Mappings:")
+        for record in result["slowest"]:
+            inputs_str = ", ".join(record["inputs"])
+            outputs_str = ", ".join(record["outputs"])
+            click.echo(f"  {record['duration_seconds']:>8.2f}s  [{inputs_str}] -> [{outputs_str}]")
+
+    if result["rebuild_order"]:
+        click.echo("\nRebuild Order (out of sync, longest first):")
+        for record in result["rebuild_order"]:
+            inputs_str = ", ".join(record["inputs"])
+            outputs_str = ", ".join(record["outputs"])
+            click.echo(f"  {record['index'] + 1}. [{inputs_str}] -> [{outputs_str}]")
+
+
+@cli.command()
+@click.option(
+    "--to",
+    "file_format",
+    type=click.Choice(["json", "compact"]),
+    default="json",
+    show_default=True,
+    help="Target on-disk format",
+)
+def migrate(file_format: str):
+    """Migrate tracking file to the multi-file format, in pretty JSON or compact form.
     
     This command reads the existing tracking file and saves it back with the new format.
     The Pydantic model automatically handles the conversion from old to new format.
+    The compact format stores each path once in a string table and hashes as base64;
+    it is smaller and faster to load, while pretty JSON is easier to review.
+    Both formats are detected automatically when loading.
     """
+    from .utils import load_tracking_data, save_tracking_data
+
     try:
-        click.echo("Migrating tracking file to multi-file format...")
+        click.echo(f"Migrating tracking file to multi-file {file_format} format...")
         
-        # Load with backward compatibility
+        # Load with backward compatibility, in whichever format is on disk
         data = load_tracking_data()
         
         # Save with new format
-        save_tracking_data(data)
+        save_tracking_data(data, file_format)
         
         click.echo("✓ Migration complete!")
         click.echo(f"  Migrated {len(data.last_generation.mappings)} mapping(s)")
@@ -220,50 +464,157 @@ def migrate():
 
 
 @cli.command()
-def status():
+@format_option
+@click.option("--fail-fast", is_flag=True, help="Stop at the first out-of-sync file")
+def status(output_format: str, fail_fast: bool):
     """Show current tracking status."""
-    try:
-        data = load_tracking_data()
+    result = _remote("status", {"fail_fast": fail_fast})
+    if result is not None:
+        summary = {
+            key: result[key] for key in result if key not in ("mappings", "in_sync", "issues")
+        }
+        mappings = result["mappings"]
+        found = result["issues"]
+    else:
+        from .utils import load_tracking_data, summarize_tracking
 
-        click.echo(f"\n{'='*70}")
-        click.echo("Documentation Tracking Status")
-        click.echo(f"{'='*70}\n")
+        try:
+            data = load_tracking_data()
+        except FileNotFoundError:
+            click.echo("✗ No tracking file found", err=True)
+            raise click.Abort()
+        except Exception as e:
+            click.echo(f"✗ Error: {e}", err=True)
+            raise click.Abort()
+
+        summary = summarize_tracking(data)
+        mappings = [
+            m.model_dump(mode="json", exclude_none=True) for m in data.last_generation.mappings
+        ]
+        found = _local_issues(data.last_generation.mappings)
+
+    if output_format != "text":
+        if output_format == "ndjson":
+            _emit({"event": "status", **summary})
+            for record in mappings:
+                _emit({"event": "mapping", **record})
+
+        issues = _report_issues(found, output_format, fail_fast)
+
+        if output_format == "json":
+            _emit(
+                {**summary, "mappings": mappings, "in_sync": not issues, "issues": issues},
+                pretty=True,
+            )
+        else:
+            _emit({"event": "result", "in_sync": not issues, "issue_count": len(issues)})
+
+        if issues:
+            sys.exit(1)
+        return
+
+    click.echo(f"\n{'='*70}")
+    click.echo("Documentation Tracking Status")
+    click.echo(f"{'='*70}\n")
+
+    click.echo(f"Version:        {summary['version']}")
+    last_update = datetime.fromisoformat(summary["last_update"])
+    click.echo(f"Last Update:    {last_update:%Y-%m-%d %H:%M:%S}")
+    click.echo(f"Last Commit:    {summary['last_commit']}")
+    click.echo(f"Generator:      {summary['generator']}")
+    click.echo(f"Total Mappings: {summary['total_mappings']}")
+    click.echo(f"History Items:  {summary['history_items']}\n")
+
+    click.echo("Current Mappings:")
+    for i, mapping in enumerate(mappings, 1):
+        inputs, outputs = mapping["inputs"], mapping["outputs"]
+        # Format inputs and outputs
+        inputs_str = ", ".join(inputs) if len(inputs) > 1 else inputs[0]
+        outputs_str = ", ".join(outputs) if len(outputs) > 1 else outputs[0]
+
+        if len(inputs) > 1 or len(outputs) > 1:
+            click.echo(f"  {i}. Multi-file mapping:")
+            click.echo(f"     Inputs:  [{inputs_str}]")
+            click.echo(f"     Outputs: [{outputs_str}]")
+        else:
+            click.echo(f"  {i}. {inputs_str} -> {outputs_str}")
+        click.echo(f"     {mapping['description']}")
 
-        click.echo(f"Version:        {data.version}")
-        click.echo(f"Last Update:    {format_timestamp(data.last_generation.timestamp)}")
-        click.echo(f"Last Commit:    {data.last_generation.commit_id}")
-        click.echo(f"Generator:      {data.last_generation.generator}")
-        click.echo(f"Total Mappings: {len(data.last_generation.mappings)}")
-        click.echo(f"History Items:  {len(data.history)}\n")
+    click.echo()
 
-        click.echo("Current Mappings:")
-        for i, mapping in enumerate(data.last_generation.mappings, 1):
-            # Format inputs and outputs
-            inputs_str = ", ".join(mapping.inputs) if len(mapping.inputs) > 1 else mapping.inputs[0]
-            outputs_str = ", ".join(mapping.outputs) if len(mapping.outputs) > 1 else mapping.outputs[0]
-            
-            if len(mapping.inputs) > 1 or len(mapping.outputs) > 1:
-                click.echo(f"  {i}. Multi-file mapping:")
-                click.echo(f"     Inputs:  [{inputs_str}]")
-                click.echo(f"     Outputs: [{outputs_str}]")
-            else:
-                click.echo(f"  {i}. {inputs_str} -> {outputs_str}")
-            click.echo(f"     {mapping.description}")
-
-        click.echo()
-
-        # Check sync status
-        in_sync, issues = check_files_in_sync()
-        if in_sync:
-            click.echo("✓ All files in sync")
-        else:
-            click.echo(f"⚠ {len(issues)} file(s) out of sync")
+    # Check sync status
+    issues = _report_issues(found, "text", fail_fast)
+    if not issues:
+        click.echo("✓ All files in sync")
+    else:
+        click.echo(f"⚠ {len(issues)} file(s) out of sync")
+        sys.exit(1)
 
-    except FileNotFoundError:
-        click.echo("✗ No tracking file found", err=True)
-        raise click.Abort()
-    except Exception as e:
-        click.echo(f"✗ Error: {e}", err=True)
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True)
+@format_option
+def impacted(paths: tuple[str, ...], output_format: str):
+    """List the mappings that use any of the given paths.
+
+    Paths are matched against mapping inputs and outputs; a path matches
+    every fragment of that file.
+    """
+    result = _remote("impacted", {"paths": list(paths)})
+    if result is None:
+        from .utils import build_path_index, impacted_positions, load_tracking_data
+
+        try:
+            tracked = load_tracking_data().last_generation.mappings
+        except FileNotFoundError:
+            click.echo("✗ No tracking file found", err=True)
+            raise click.Abort()
+
+        positions = impacted_positions(build_path_index(tracked), paths)
+        result = {
+            "mappings": [
+                {"index": p, **tracked[p].model_dump(mode="json", exclude_none=True)}
+                for p in positions
+            ]
+        }
+
+    if output_format == "json":
+        _emit(result, pretty=True)
+    elif output_format == "ndjson":
+        for record in result["mappings"]:
+            _emit({"event": "mapping", **record})
+    elif not result["mappings"]:
+        click.echo("No tracked mappings use these paths")
+    else:
+        for record in result["mappings"]:
+            inputs_str = ", ".join(record["inputs"])
+            outputs_str = ", ".join(record["outputs"])
+            click.echo(f"  {record['index'] + 1}. [{inputs_str}] -> [{outputs_str}]")
+            click.echo(f"     {record['description']}")
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    default=DEFAULT_SOCKET,
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="Unix socket to listen on",
+)
+def serve(socket_path: str):
+    """Run a local query server that keeps tracking state warm.
+
+    Other commands use it when given --socket (or TRACK_SOCKET), e.g.
+    `track --socket .docs-tracking.sock sync`.
+    """
+    from .server import serve as serve_forever
+
+    click.echo(f"Serving tracking queries on {socket_path} (Ctrl+C to stop)")
+    try:
+        serve_forever(socket_path)
+    except RuntimeError as e:
+        click.echo(f"✗ {e}", err=True)
         raise click.Abort()
 
 
@@ -0,0 +1,42 @@
+"""Client for the ``track serve`` query server.
+
+Only the standard library is used here, so commands run with ``--socket``
+start without loading pydantic, GitPython or jsonschema; the server does the
+work and replies with plain JSON.
+"""
+
+import json
+import socket
+from typing import Any, Optional
+
+DEFAULT_SOCKET = ".docs-tracking.sock"
+
+
+def query(
+    method: str,
+    params: Optional[dict] = None,
+    socket_path: str = DEFAULT_SOCKET,
+    timeout: float = 60.0,
+) -> Any:
+    """Send one request to a running server and return its result.
+
+    Raises OSError if no server is listening and RuntimeError if the server
+    reports an error.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        request = {"id": 1, "method": method, "params": params or {}}
+        sock.sendall(json.dumps(request).encode() + b"\n")
+
+        chunks = []
+        while not chunks or not chunks[-1].endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            chunks.append(chunk)
+
+    response = json.loads(b"".join(chunks))
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response["result"]
@@ -0,0 +1,108 @@
+"""Compact on-disk tracking format.
+
+The compact format stores every path once in a string table and has
+mappings refer to paths by index, with hashes stored as base64 instead of
+hex. It is a lossless re-encoding of the regular JSON document::
+
+    {
+      "format": "compact",
+      "version": "1.0.0",
+      "paths": ["inputs/uri.csv", "docs/tools-catalog.md"],
+      "last_generation": {
+        "commit_id": "...", "timestamp": "...", "generator": "...",
+        "mappings": [
+          {"i": [0], "o": [1], "ih": [[0, "<base64>"]], "description": "..."}
+        ]
+      },
+      "history": [...]
+    }
+
+Mapping fields other than paths and hashes are kept as they are. The path
+table comes before the mappings so the file can be read incrementally.
+"""
+
+import binascii
+
+COMPACT_FORMAT = "compact"
+
+# Mapping fields encoded as path indices / (path index, hash) pairs
+_PATH_FIELDS = {"inputs": "i", "outputs": "o"}
+_HASH_FIELDS = {"input_hashes": "ih", "output_hashes": "oh"}
+
+
+def is_compact(document: dict) -> bool:
+    """Return True if a decoded tracking document uses the compact format."""
+    return document.get("format") == COMPACT_FORMAT
+
+
+def encode_hash(hex_digest: str) -> str:
+    """Encode a hex digest as base64."""
+    return binascii.b2a_base64(bytes.fromhex(hex_digest), newline=False).decode("ascii")
+
+
+def decode_hash(encoded: str) -> str:
+    """Decode a base64 digest back to hex."""
+    return binascii.a2b_base64(encoded).hex()
+
+
+def to_compact(document: dict) -> dict:
+    """Convert a regular tracking document (as dumped to JSON) to compact form."""
+    paths: list[str] = []
+    positions: dict[str, int] = {}
+
+    def intern(path: str) -> int:
+        if path not in positions:
+            positions[path] = len(paths)
+            paths.append(path)
+        return positions[path]
+
+    mappings = []
+    for mapping in document["last_generation"]["mappings"]:
+        compact = {}
+        for field, value in mapping.items():
+            if field in _PATH_FIELDS:
+                compact[_PATH_FIELDS[field]] = [intern(path) for path in value]
+            elif field in _HASH_FIELDS:
+                try:
+                    compact[_HASH_FIELDS[field]] = [
+                        [intern(path), encode_hash(digest)] for path, digest in value.items()
+                    ]
+                except ValueError as e:
+                    raise ValueError(f"Cannot compact non-hex hash in {field}: {e}") from e
+            else:
+                compact[field] = value
+        mappings.append(compact)
+
+    generation = {**document["last_generation"], "mappings": mappings}
+    result = {"format": COMPACT_FORMAT, "version": document["version"], "paths": paths}
+    result.update((key, value) for key, value in document.items() if key != "version")
+    result["last_generation"] = generation
+    return result
+
+
+def expand_mapping(compact: dict, paths: list[str]) -> dict:
+    """Expand one compact mapping in place using the document's path table.
+
+    Expanding in place avoids copying every mapping of a freshly decoded
+    document, which is most of the cost of loading a compact file.
+    """
+    a2b = binascii.a2b_base64
+    try:
+        compact["inputs"] = [paths[index] for index in compact.pop("i")]
+        compact["outputs"] = [paths[index] for index in compact.pop("o")]
+        for short, field in (("ih", "input_hashes"), ("oh", "output_hashes")):
+            pairs = compact.pop(short, None)
+            if pairs is not None:
+                compact[field] = {paths[index]: a2b(digest).hex() for index, digest in pairs}
+    except (IndexError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid compact mapping: {e!r}") from e
+    return compact
+
+
+def from_compact(document: dict) -> dict:
+    """Expand a decoded compact tracking document, in place, to the regular form."""
+    paths = document.pop("paths")
+    document.pop("format")
+    for mapping in document["last_generation"]["mappings"]:
+        expand_mapping(mapping, paths)
+    return document
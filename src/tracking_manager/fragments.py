@@ -0,0 +1,137 @@
+"""Fragment addressing for Markdown sections and CSV rows.
+
+A tracked path may carry a fragment, ``file.md#heading-slug`` or
+``file.csv#key``, so that a mapping only depends on the part of the file it
+consumes. Each file is parsed once into a table of fragment contents.
+"""
+
+import csv
+import io
+import re
+from typing import Optional
+from urllib.parse import urlsplit
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+CSV_SUFFIXES = (".csv",)
+
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE = re.compile(r"^(```|~~~)")
+
+
+def split_fragment(path: str) -> tuple[str, Optional[str]]:
+    """Split ``file#fragment`` into the file path and the fragment (or None)."""
+    base, sep, fragment = path.partition("#")
+    return base, (fragment if sep and fragment else None)
+
+
+def supports_fragments(path: str) -> bool:
+    """Return True if fragments of this file type can be addressed."""
+    return path.lower().endswith(MARKDOWN_SUFFIXES + CSV_SUFFIXES)
+
+
+def slugify(heading: str) -> str:
+    """Turn a heading into a GitHub-style anchor slug.
+
+    Punctuation is dropped and spaces become hyphens, so
+    ``"1.2 Draw.io (diagrams.net)"`` becomes ``"12-drawio-diagramsnet"``.
+    """
+    slug = re.sub(r"[^\w\- ]", "", heading.strip().lower())
+    return slug.replace(" ", "-")
+
+
+def markdown_fragments(text: str) -> dict[str, str]:
+    """Split Markdown into sections keyed by heading slug.
+
+    A section runs from its heading to the next heading of the same or a
+    higher level, so it includes its subsections. Duplicate slugs get
+    ``-1``, ``-2``... suffixes like GitHub anchors. Headings inside fenced
+    code blocks are ignored.
+    """
+    lines = text.splitlines(keepends=True)
+    headings: list[tuple[int, int, str]] = []
+    seen: dict[str, int] = {}
+    in_fence = False
+
+    for number, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else _HEADING.match(line.rstrip("\n"))
+        if match:
+            slug = slugify(match.group(2))
+            if slug in seen:
+                seen[slug] += 1
+                slug = f"{slug}-{seen[slug]}"
+            else:
+                seen[slug] = 0
+            headings.append((number, len(match.group(1)), slug))
+
+    sections = {}
+    for position, (start, level, slug) in enumerate(headings):
+        end = len(lines)
+        for next_start, next_level, _ in headings[position + 1 :]:
+            if next_level <= level:
+                end = next_start
+                break
+        sections[slug] = "".join(lines[start:end])
+    return sections
+
+
+def csv_key(value: str) -> str:
+    """Derive the fragment key of a CSV row from its first column.
+
+    Repository URLs (ending in ``.git``) are keyed by the repository name and
+    other URLs by the domain name without its subdomains and suffix, so
+    ``https://github.com/awslabs/diagram-as-code.git`` becomes
+    ``"diagram-as-code"`` and ``https://publications.opengroup.org/standards``
+    becomes ``"opengroup"``. Any other value is slugified like a heading.
+    """
+    value = value.strip()
+    if value.endswith(".git"):
+        name = re.split(r"[/:]", value[: -len(".git")])[-1]
+    elif host := urlsplit(value).hostname:
+        labels = host.removeprefix("www.").split(".")
+        name = labels[-2] if len(labels) > 1 else labels[0]
+    else:
+        name = value
+    return slugify(name)
+
+
+def csv_fragments(text: str) -> dict[str, str]:
+    """Split CSV rows into fragments keyed by ``csv_key`` of their first column.
+
+    Each row has exactly one key, so ``uri.csv#mermaid`` selects the row
+    ``https://github.com/mermaid-js/mermaid.git``. The header row is not
+    addressable. Raises ValueError if two rows share a key.
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+
+    rows: dict[str, str] = {}
+    lines: dict[str, int] = {}
+    reader = csv.reader(io.StringIO(text), dialect)
+    next(reader, None)
+
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        key = csv_key(row[0])
+        if key in rows:
+            raise ValueError(
+                f"Ambiguous CSV key {key!r} on lines {lines[key]} and {reader.line_num}"
+            )
+        rows[key] = dialect.delimiter.join(row) + "\n"
+        lines[key] = reader.line_num
+    return rows
+
+
+def parse_fragments(path: str, data: bytes) -> dict[str, str]:
+    """Parse a file's content into its fragment table based on its suffix."""
+    text = data.decode("utf-8")
+    if path.lower().endswith(MARKDOWN_SUFFIXES):
+        return markdown_fragments(text)
+    if path.lower().endswith(CSV_SUFFIXES):
+        return csv_fragments(text)
+    raise ValueError(f"Fragments are not supported for {path}")
@@ -0,0 +1,204 @@
+"""Git repository inputs tracked by resolved commit instead of content.
+
+A mapping input of the form ``git+<url>@<ref>`` (for example
+``git+https://github.com/mermaid-js/mermaid.git@develop``) stands for an
+upstream repository. It is "hashed" by resolving the ref to a commit SHA with
+``git ls-remote``, so sync reports when upstream moves. Refs are resolved
+concurrently in one batch and cached on disk for a short TTL so repeated
+syncs do not hit the network.
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+GIT_PREFIX = "git+"
+REF_CACHE_FILE = ".docs-tracking-cache/git-refs.json"
+
+# Seconds a resolved ref is trusted before asking the remote again
+DEFAULT_REF_TTL = 300
+
+MAX_WORKERS = 8
+
+# Seconds before a hanging ``git ls-remote`` is killed
+LS_REMOTE_TIMEOUT = 30
+
+_FULL_SHA = re.compile(r"^[0-9a-f]{40}$")
+_GIT_SPEC = re.compile(r'"(git\+[^"\\]+)"')
+
+
+def is_git_ref(path: str) -> bool:
+    """Return True if a tracked path is a git repository input."""
+    return path.startswith(GIT_PREFIX)
+
+
+def parse_git_ref(spec: str) -> tuple[str, str]:
+    """Split ``git+<url>@<ref>`` into the URL and the ref (``HEAD`` if omitted).
+
+    Only an ``@`` in the repository path starts a ref, so the user part of
+    ``git+ssh://git@host/repo.git`` or ``git+git@host:repo.git`` is never
+    mistaken for one. Ref names cannot contain ``:``.
+    """
+    if not is_git_ref(spec):
+        raise ValueError(f"Not a git input: {spec}")
+    target = spec[len(GIT_PREFIX) :]
+    start = _path_start(target)
+    path, sep, ref = target[start:].rpartition("@")
+    if not sep or not path or not ref or ":" in ref:
+        return target, "HEAD"
+    return target[:start] + path, ref
+
+
+def _path_start(target: str) -> int:
+    """Return where the repository path begins in a URL, scp-style address or local path."""
+    scheme, sep, rest = target.partition("://")
+    if sep:
+        slash = rest.find("/")
+        return len(scheme) + len(sep) + (slash if slash >= 0 else len(rest))
+    colon = target.find(":")
+    # scp-style ``[user@]host:path`` has its colon before any slash
+    if colon >= 0 and "/" not in target[:colon]:
+        return colon + 1
+    return 0
+
+
+def _ssh_configured(cmd) -> bool:
+    """Return True if the user chose an SSH command for git.
+
+    ``GIT_SSH_COMMAND``, ``GIT_SSH`` and ``core.sshCommand`` are left to take
+    effect untouched; only plain ``ssh`` is made non-interactive.
+    """
+    if os.environ.get("GIT_SSH_COMMAND") or os.environ.get("GIT_SSH"):
+        return True
+    return bool(cmd.config("--get", "core.sshCommand", with_exceptions=False))
+
+
+def resolve_ref(url: str, ref: str) -> Optional[str]:
+    """Resolve a ref of a remote repository to a commit SHA with ``git ls-remote``.
+
+    The call never prompts for credentials and is killed after
+    ``LS_REMOTE_TIMEOUT`` seconds. Returns None if the remote cannot be
+    reached or has no such ref.
+    """
+    if _FULL_SHA.match(ref):
+        return ref
+
+    # Imported here so the client path of the CLI does not load GitPython
+    import git
+
+    env = {"GIT_TERMINAL_PROMPT": "0"}
+    try:
+        cmd = git.Git()
+        if not _ssh_configured(cmd):
+            # Fail instead of prompting for a passphrase or host key confirmation
+            env["GIT_SSH_COMMAND"] = "ssh -o BatchMode=yes"
+        output = cmd.ls_remote(url, ref, env=env, kill_after_timeout=LS_REMOTE_TIMEOUT)
+    except (git.GitError, OSError):
+        return None
+
+    refs = {}
+    for line in output.splitlines():
+        sha, _, name = line.partition("\t")
+        refs[name] = sha
+
+    # Annotated tags are peeled to the commit they point at
+    for name in (
+        ref,
+        f"refs/heads/{ref}",
+        f"refs/tags/{ref}^{{}}",
+        f"refs/tags/{ref}",
+    ):
+        if name in refs:
+            return refs[name]
+    return None
+
+
+class RefCache:
+    """On-disk cache of resolved refs with a time-to-live."""
+
+    def __init__(self, cache_path: Optional[Path] = None, ttl: float = DEFAULT_REF_TTL):
+        self.cache_path = cache_path or Path(REF_CACHE_FILE)
+        self.ttl = ttl
+        self._entries: Optional[dict[str, dict]] = None
+
+    def get(self, spec: str) -> Optional[str]:
+        """Return the cached SHA for a spec if it is still fresh."""
+        entry = self._load().get(spec)
+        if entry is None or time.time() - entry["resolved_at"] > self.ttl:
+            return None
+        return entry["sha"]
+
+    def update(self, resolved: dict[str, str]) -> None:
+        """Record freshly resolved SHAs and write the cache file."""
+        if not resolved:
+            return
+        entries = self._load()
+        now = time.time()
+        for spec, sha in resolved.items():
+            entries[spec] = {"sha": sha, "resolved_at": now}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(entries, indent=2) + "\n")
+        except OSError:
+            # The cache is an optimization; a read-only tree still works
+            pass
+
+    def _load(self) -> dict[str, dict]:
+        """Read the cache file once."""
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.cache_path.read_text())
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+
+def resolve_refs(
+    specs: Iterable[str], cache: Optional[RefCache] = None, max_workers: int = MAX_WORKERS
+) -> dict[str, Optional[str]]:
+    """Resolve git input specs to commit SHAs in one concurrent batch.
+
+    Fresh cache entries are used as they are; the remaining refs are resolved
+    in parallel. Specs whose remote or ref cannot be resolved map to None.
+    """
+    cache = cache or RefCache()
+    results: dict[str, Optional[str]] = {}
+    pending = []
+    for spec in dict.fromkeys(specs):
+        sha = cache.get(spec)
+        if sha is not None:
+            results[spec] = sha
+        else:
+            pending.append(spec)
+
+    if pending:
+        urls, refs = zip(*(parse_git_ref(spec) for spec in pending))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            resolved = dict(zip(pending, pool.map(resolve_ref, urls, refs)))
+        cache.update({spec: sha for spec, sha in resolved.items() if sha is not None})
+        results.update(resolved)
+    return results
+
+
+def scan_git_refs(tracking_path: Path, chunk_size: int = 1024 * 1024) -> set[str]:
+    """Find every git input spec in a tracking file without parsing it.
+
+    Used to resolve all refs in one batch before mappings are streamed.
+    """
+    specs: set[str] = set()
+    tail = ""
+    with open(tracking_path, encoding="utf-8") as f:
+        while chunk := f.read(chunk_size):
+            text = tail + chunk
+            last_end = 0
+            for match in _GIT_SPEC.finditer(text):
+                specs.add(match.group(1))
+                last_end = match.end()
+            # Keep a string that may continue in the next chunk
+            start = text.rfind('"')
+            tail = text[start:] if start >= last_end else ""
+    return specs
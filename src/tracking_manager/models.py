@@ -1,11 +1,27 @@
 """Pydantic models for documentation tracking."""
 
 from datetime import datetime
-from typing import Optional, Union
+from typing import Literal, Optional, Union
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
 
+class MappingMetrics(BaseModel):
+    """Cost measurements of a mapping, captured when it is tracked or refreshed."""
+
+    duration_seconds: Optional[float] = Field(
+        None, description="Generation time reported by the generator", ge=0
+    )
+    bytes_in: Optional[int] = Field(None, description="Total size of the input files", ge=0)
+    bytes_out: Optional[int] = Field(None, description="Total size of the output files", ge=0)
+    hash_seconds: Optional[float] = Field(
+        None, description="Time spent hashing the mapping's files", ge=0
+    )
+    regenerations: int = Field(
+        0, description="Number of refreshes after the outputs were regenerated", ge=0
+    )
+
+
 class Mapping(BaseModel):
     """Input-output mapping for documentation generation.
     
@@ -21,6 +37,10 @@ class Mapping(BaseModel):
     output_hashes: Optional[dict[str, str]] = Field(
         None, description="SHA-256 hashes of output files (filename -> hash)"
     )
+    hash_algorithm: Optional[Literal["sha256", "git-blob"]] = Field(
+        None, description="Algorithm used for input/output hashes (default: sha256)"
+    )
+    metrics: Optional[MappingMetrics] = Field(None, description="Generation cost measurements")
     
     # Backward compatibility fields (deprecated)
     input: Optional[str] = Field(None, exclude=True, description="Deprecated: use inputs")
@@ -75,3 +95,17 @@ class TrackingData(BaseModel):
     version: str = Field(..., description="Tracking data format version")
     last_generation: Generation = Field(..., description="Most recent generation")
     history: list[HistoryEntry] = Field(..., description="Historical entries")
+
+
+class SyncIssue(BaseModel):
+    """A single synchronization problem found while checking tracked files."""
+
+    kind: Literal["missing", "modified", "error"] = Field(..., description="Issue category")
+    role: Optional[Literal["input", "output"]] = Field(
+        None, description="Whether the file is a mapping input or output"
+    )
+    path: Optional[str] = Field(None, description="Tracked file path")
+    message: str = Field(..., description="Human-readable description")
+
+    def __str__(self) -> str:
+        return self.message
@@ -0,0 +1,223 @@
+"""Long-lived local query server for tracking operations.
+
+``track serve`` keeps the parsed tracking data, the reverse path index and a
+stat-keyed hash cache in memory and answers queries over a Unix socket using
+a JSON-lines protocol. Each request is one line::
+
+    {"id": 1, "method": "sync", "params": {"fail_fast": true}}
+
+and each response is one line with either ``result`` or ``error``::
+
+    {"id": 1, "result": {"in_sync": false, "issues": [...]}}
+
+State is revalidated on every request: the tracking file is reloaded when its
+stat data changes, tracked files are rehashed only when theirs do, and the
+git index is re-read when git rewrites it.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from .client import DEFAULT_SOCKET, query
+from .models import TrackingData
+from .utils import (
+    TRACKING_FILE,
+    CachedHasher,
+    build_path_index,
+    impacted_positions,
+    iter_sync_issues,
+    load_tracking_data,
+    record_mapping,
+    refresh_hashes,
+    refresh_report,
+    save_tracking_data,
+    summarize_tracking,
+)
+
+# Largest accepted request line
+MAX_REQUEST_BYTES = 2**20
+
+
+class TrackingState:
+    """Tracking data, path index and hash cache kept warm between queries."""
+
+    def __init__(self):
+        self.hasher = CachedHasher()
+        self._data: Optional[TrackingData] = None
+        self._path_index: dict[str, list[int]] = {}
+        self._stamp: Optional[tuple[int, int, int]] = None
+        self._methods: dict[str, Callable[[dict], dict]] = {
+            "ping": self.ping,
+            "status": self.status,
+            "sync": self.sync,
+            "impacted": self.impacted,
+            "track": self.track,
+            "refresh": self.refresh,
+        }
+
+    def data(self) -> TrackingData:
+        """Return the tracking data, reloading it if the file changed on disk."""
+        try:
+            st = Path(TRACKING_FILE).stat()
+        except FileNotFoundError:
+            self._data, self._stamp = None, None
+            raise FileNotFoundError(f"Tracking file not found: {TRACKING_FILE}") from None
+
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self._data is None or stamp != self._stamp:
+            self._set_data(load_tracking_data(), stamp)
+        return self._data
+
+    def dispatch(self, line: bytes) -> dict:
+        """Handle one request line and build the response."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = self._methods.get(request.get("method"))
+            if method is None:
+                raise ValueError(f"Unknown method: {request.get('method')}")
+
+            self.hasher.refresh()
+            return {"id": request_id, "result": method(request.get("params") or {})}
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+
+    def ping(self, params: dict) -> dict:
+        """Report that the server is alive."""
+        return {"pid": os.getpid()}
+
+    def status(self, params: dict) -> dict:
+        """Summarize the tracking file, its mappings and sync state."""
+        data = self.data()
+        mappings = [
+            m.model_dump(mode="json", exclude_none=True) for m in data.last_generation.mappings
+        ]
+        return {**summarize_tracking(data), "mappings": mappings, **self.sync(params)}
+
+    def sync(self, params: dict) -> dict:
+        """Check tracked files, optionally stopping at the first issue."""
+        issues = []
+        for issue in iter_sync_issues(self.data().last_generation.mappings, self.hasher):
+            issues.append(issue.model_dump(mode="json", exclude_none=True))
+            if params.get("fail_fast"):
+                break
+        return {"in_sync": not issues, "issues": issues}
+
+    def impacted(self, params: dict) -> dict:
+        """List the mappings that use any of the given paths."""
+        mappings = self.data().last_generation.mappings
+        positions = impacted_positions(self._path_index, params.get("paths", []))
+        return {
+            "mappings": [
+                {"index": position, **mappings[position].model_dump(mode="json", exclude_none=True)}
+                for position in positions
+            ]
+        }
+
+    def track(self, params: dict) -> dict:
+        """Add a mapping and save the tracking file."""
+        try:
+            data = self.data()
+        except FileNotFoundError:
+            data = None
+
+        data, mapping = record_mapping(
+            data,
+            params["inputs"],
+            params["outputs"],
+            params["description"],
+            generator=params.get("generator", "warp-ai"),
+            hash_mode=params.get("hash_mode"),
+            hasher=self.hasher,
+            duration=params.get("duration"),
+        )
+        save_tracking_data(data)
+        st = Path(TRACKING_FILE).stat()
+        self._set_data(data, (st.st_mtime_ns, st.st_size, st.st_ino))
+        return {
+            "commit_id": data.last_generation.commit_id,
+            "mapping": mapping.model_dump(mode="json", exclude_none=True),
+        }
+
+    def refresh(self, params: dict) -> dict:
+        """Update stored hashes of regenerated files and save the tracking file."""
+        data = self.data()
+        refreshed, stale = refresh_hashes(
+            data, params.get("paths"), self.hasher, duration=params.get("duration")
+        )
+        if refreshed:
+            save_tracking_data(data)
+            st = Path(TRACKING_FILE).stat()
+            self._set_data(data, (st.st_mtime_ns, st.st_size, st.st_ino))
+        return refresh_report(data, refreshed, stale)
+
+    def _set_data(self, data: TrackingData, stamp: tuple[int, int, int]) -> None:
+        """Install freshly loaded tracking data and rebuild the path index."""
+        self._data = data
+        self._stamp = stamp
+        self._path_index = build_path_index(data.last_generation.mappings)
+
+
+async def _serve(state: TrackingState, socket_path: str) -> None:
+    """Accept connections and answer requests until cancelled.
+
+    Requests are dispatched on a worker thread so hashing, file I/O and
+    ``ls-remote`` calls never block the event loop; the lock serializes them
+    because the state is not thread-safe.
+    """
+    loop = asyncio.get_running_loop()
+    lock = asyncio.Lock()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                async with lock:
+                    response = await loop.run_in_executor(None, state.dispatch, line)
+                writer.write(json.dumps(response, default=str).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=socket_path, limit=MAX_REQUEST_BYTES)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        Path(socket_path).unlink(missing_ok=True)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET) -> None:
+    """Run the query server on a Unix socket until interrupted."""
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise RuntimeError(f"{socket_path} exists and is not a socket")
+        try:
+            query("ping", socket_path=socket_path)
+        except OSError:
+            # Stale socket left behind by a server that did not shut down cleanly
+            Path(socket_path).unlink()
+        else:
+            raise RuntimeError(f"A server is already listening on {socket_path}")
+
+    if threading.current_thread() is threading.main_thread():
+        # Shut down cleanly (removing the socket) on SIGTERM as well as Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    state = TrackingState()
+    try:
+        asyncio.run(_serve(state, socket_path))
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        Path(socket_path).unlink(missing_ok=True)
+
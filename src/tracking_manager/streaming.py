@@ -0,0 +1,176 @@
+"""Incremental reader for large tracking files.
+
+``iter_tracking_mappings`` walks the tracking file chunk by chunk and yields
+``last_generation.mappings`` one validated ``Mapping`` at a time. Values it
+does not need, most importantly ``history``, are scanned past without being
+decoded, and consumed input is discarded, so memory stays bounded by one
+mapping plus the read buffer regardless of the file size. Both the regular
+and the compact format are supported.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO
+
+from .compact import COMPACT_FORMAT, expand_mapping
+from .models import Mapping
+
+CHUNK_SIZE = 64 * 1024
+
+_NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+# Whole strings are matched in one step so only brackets reach Python code
+_SKIP_TOKEN = re.compile(
+    r'(?P<string>"[^"\\]*(?:\\.[^"\\]*)*")|(?P<open>[\[{])|(?P<close>[\]}])|(?P<partial>")'
+)
+_DECODER = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Minimal pull parser over a text file that keeps only unread input."""
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        """Drop consumed input and read the next chunk; False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._file.read(size or self._chunk_size)
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        self._eof = not chunk
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            match = _NON_WHITESPACE.search(self._buffer, self._pos)
+            if match is not None:
+                self._pos = match.start()
+                return match.group()
+            self._pos = len(self._buffer)
+            if not self._fill():
+                raise ValueError("Unexpected end of tracking file")
+
+    def expect(self, char: str) -> None:
+        """Consume the next non-whitespace character, which must be ``char``."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in tracking file, found {found!r}")
+        self._pos += 1
+
+    def read_value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        # Grow reads geometrically so a large value is not re-decoded per chunk
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # A number cut at the buffer end may continue in the next chunk
+            if end == len(self._buffer) and self._fill(size):
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self) -> None:
+        """Consume the next JSON value without decoding it."""
+        if self.peek() not in "[{":
+            self.read_value()
+            return
+
+        depth = 0
+        while True:
+            for match in _SKIP_TOKEN.finditer(self._buffer, self._pos):
+                kind = match.lastgroup
+                if kind == "open":
+                    depth += 1
+                elif kind == "close":
+                    depth -= 1
+                    if depth == 0:
+                        self._pos = match.end()
+                        return
+                elif kind == "partial":
+                    # A string continues into the next chunk
+                    self._pos = match.start()
+                    break
+            else:
+                self._pos = len(self._buffer)
+            if not self._fill():
+                raise ValueError("Unexpected end of tracking file")
+
+    def iter_object(self) -> Iterator[str]:
+        """Iterate the keys of an object; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def iter_array(self) -> Iterator[Any]:
+        """Decode the elements of an array one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_tracking_mappings(tracking_path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Mapping]:
+    """Yield the current mappings of a tracking file one at a time.
+
+    Each mapping is validated on its own as soon as it is read. ``history``
+    and every other value outside ``last_generation.mappings`` is skipped.
+    """
+    if not tracking_path.exists():
+        raise FileNotFoundError(f"Tracking file not found: {tracking_path}")
+
+    with open(tracking_path, encoding="utf-8") as f:
+        stream = _JsonStream(f, chunk_size)
+        file_format = None
+        paths: Optional[list[str]] = None
+
+        for key in stream.iter_object():
+            if key == "format":
+                file_format = stream.read_value()
+            elif key == "paths":
+                paths = stream.read_value()
+            elif key == "last_generation":
+                for generation_key in stream.iter_object():
+                    if generation_key != "mappings":
+                        stream.skip_value()
+                        continue
+                    for mapping in stream.iter_array():
+                        if file_format == COMPACT_FORMAT:
+                            if paths is None:
+                                raise ValueError(
+                                    "Compact tracking file lists mappings before paths"
+                                )
+                            mapping = expand_mapping(mapping, paths)
+                        yield Mapping.model_validate(mapping)
+            else:
+                stream.skip_value()
@@ -1,19 +1,60 @@
 """Utility functions for tracking operations."""
 
+import gc
 import hashlib
 import json
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 import git
 from jsonschema import ValidationError, validate
 
-from .models import TrackingData
+from .compact import COMPACT_FORMAT, from_compact, is_compact, to_compact
+from .fragments import parse_fragments, split_fragment, supports_fragments
+from .gitrefs import RefCache, is_git_ref, resolve_refs, scan_git_refs
+from .models import (
+    Generation,
+    HistoryEntry,
+    Mapping,
+    MappingMetrics,
+    SyncIssue,
+    TrackingData,
+)
+from .streaming import iter_tracking_mappings
 
 TRACKING_FILE = ".docs-tracking.json"
 SCHEMA_FILE = "schema/tracking-schema.json"
 
+STAT_CACHE_FILE = ".docs-tracking-cache/stat-cache.json"
+
+# Files modified this recently are never served from a stat-keyed cache
+RACY_WINDOW_NS = 2 * 10**9
+
+MAX_HASH_WORKERS = 8
+
+# One ``git ls-files -s --debug -z`` entry: mode, blob ID, stage and path,
+# then the cached stat data
+_LS_FILES_ENTRY = re.compile(
+    r"\d+ ([0-9a-f]+) (\d)\t([^\0]*)\0"
+    r"  ctime: \d+:\d+\n"
+    r"  mtime: (\d+):(\d+)\n"
+    r"  dev: \d+\tino: \d+\n"
+    r"  uid: \d+\tgid: \d+\n"
+    r"  size: (\d+)\tflags: [0-9a-f]+(?:\n|$)"
+)
+
+# Mapping metrics summarized by ``mapping_stats``
+METRIC_FIELDS = ("duration_seconds", "hash_seconds", "bytes_in", "bytes_out", "regenerations")
+
 
 def get_repo() -> git.Repo:
     """Get the current git repository."""
@@ -38,40 +79,712 @@ def hash_file(file_path: Path) -> str:
     return sha256.hexdigest()
 
 
+def git_blob_id(file_path: Path) -> str:
+    """Calculate the git blob ID (SHA-1 of the blob header and content) of a file."""
+    sha1 = hashlib.sha1()
+    sha1.update(f"blob {file_path.stat().st_size}\0".encode())
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def hash_bytes(data: bytes, algorithm: Optional[str] = None) -> str:
+    """Hash in-memory content with the given algorithm (``sha256`` or ``git-blob``)."""
+    if algorithm in (None, "sha256"):
+        return hashlib.sha256(data).hexdigest()
+    if algorithm == "git-blob":
+        return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+    raise ValueError(f"Unknown hash algorithm: {algorithm}")
+
+
+class FileHasher:
+    """Hash tracked files, reusing the git index for ``git-blob`` mappings.
+
+    The index is read once, on the first ``git-blob`` lookup. A path whose
+    stat data (mtime and size) still matches its index entry gets the blob ID
+    straight from the index without reading the file; dirty, racily-clean and
+    untracked paths are hashed from disk.
+    """
+
+    def __init__(self, repo: Optional[git.Repo] = None, ref_cache: Optional[RefCache] = None):
+        self._repo = repo
+        self._index: Optional[dict[str, tuple[int, int, int, str]]] = None
+        self._index_mtime_ns = 0
+        self._fragments: dict[Path, tuple[object, dict[str, str]]] = {}
+        self._ref_cache = ref_cache
+        self._git_refs: dict[str, Optional[str]] = {}
+
+    def prefetch_git_refs(self, paths: Iterable[str]) -> None:
+        """Resolve all not yet known repository inputs among paths in one batch."""
+        specs = [path for path in paths if is_git_ref(path) and path not in self._git_refs]
+        if specs:
+            self._git_refs.update(resolve_refs(specs, self._ref_cache))
+
+    def git_ref(self, spec: str) -> Optional[str]:
+        """Return the commit a repository input resolves to, or None if unresolvable."""
+        if spec not in self._git_refs:
+            self.prefetch_git_refs([spec])
+        return self._git_refs[spec]
+
+    def exists(self, file_path: Path) -> bool:
+        """Return True if the file is present."""
+        return file_path.exists()
+
+    def read(self, file_path: Path) -> Optional[bytes]:
+        """Return the content of a file, or None if it does not exist."""
+        try:
+            return file_path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def hash_path(self, path: str, algorithm: Optional[str] = None) -> Optional[str]:
+        """Hash a tracked path, which may address a fragment (``file.md#slug``).
+
+        Repository inputs (``git+<url>@<ref>``) hash to their resolved commit.
+        Returns None if the file or the fragment does not exist.
+        """
+        if is_git_ref(path):
+            return self.git_ref(path)
+        base, fragment = split_fragment(path)
+        file_path = Path(base)
+        if not self.exists(file_path):
+            return None
+        if fragment is not None:
+            return self.fragment_hash(file_path, fragment, algorithm)
+        return self.hash(file_path, algorithm)
+
+    def fragment_hash(
+        self, file_path: Path, fragment: str, algorithm: Optional[str] = None
+    ) -> Optional[str]:
+        """Hash one section or row of a file, or return None if it does not exist.
+
+        The file is parsed once per content version; every fragment of it is
+        then served from the cached table.
+        """
+        key = self._content_key(file_path)
+        cached = self._fragments.get(file_path)
+        if cached is None or cached[0] != key:
+            data = self.read(file_path)
+            table = parse_fragments(file_path.name, data) if data is not None else {}
+            cached = self._fragments[file_path] = (key, table)
+
+        content = cached[1].get(fragment)
+        return hash_bytes(content.encode("utf-8"), algorithm) if content is not None else None
+
+    def _content_key(self, file_path: Path) -> object:
+        """Return a value that changes whenever the file content may have changed."""
+        st = file_path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def hash(self, file_path: Path, algorithm: Optional[str] = None) -> str:
+        """Hash a file with the given algorithm (``sha256`` or ``git-blob``)."""
+        if algorithm in (None, "sha256"):
+            return hash_file(file_path)
+        if algorithm == "git-blob":
+            return self._index_blob_id(file_path) or git_blob_id(file_path)
+        raise ValueError(f"Unknown hash algorithm: {algorithm}")
+
+    def refresh(self) -> None:
+        """Drop resolved refs, and the git index if it was rewritten since it was read.
+
+        Refs are re-read from the TTL-bound ref cache on the next lookup.
+        """
+        self._git_refs.clear()
+        if self._index is None or self._repo is None:
+            return
+        try:
+            index_mtime_ns = self._index_file().stat().st_mtime_ns
+        except OSError:
+            index_mtime_ns = 0
+        if index_mtime_ns != self._index_mtime_ns:
+            self._index = None
+
+    def _index_blob_id(self, file_path: Path) -> Optional[str]:
+        """Return the blob ID from the git index if the file is stat-clean."""
+        entries = self._load_index()
+        key = self._index_key(file_path) if entries else None
+        if key is None or key not in entries:
+            return None
+
+        st = file_path.stat()
+        mtime_s, mtime_ns, size, hexsha = entries[key]
+        # Files modified in the same instant the index was written are racy
+        if st.st_mtime_ns >= self._index_mtime_ns:
+            return None
+        if (st.st_mtime_ns // 10**9 & 0xFFFFFFFF, st.st_mtime_ns % 10**9) != (mtime_s, mtime_ns):
+            return None
+        if st.st_size & 0xFFFFFFFF != size:
+            return None
+        return hexsha
+
+    def _index_key(self, file_path: Path) -> Optional[str]:
+        """Return the index path of a file, or None if it is outside the work tree."""
+        try:
+            return file_path.resolve().relative_to(self._working_tree()).as_posix()
+        except (ValueError, RuntimeError):
+            return None
+
+    def _working_tree(self) -> Path:
+        """Return the resolved work tree root, opening the repository on first use."""
+        if self._repo is None:
+            self._repo = get_repo()
+        return Path(self._repo.working_tree_dir).resolve()
+
+    def _index_file(self) -> Path:
+        """Return the index file in use.
+
+        Git runs the hooks of ``git commit -a`` and ``git commit <paths>``
+        with a temporary index named in ``GIT_INDEX_FILE``; that index holds
+        what is being committed.
+        """
+        index_file = os.environ.get("GIT_INDEX_FILE")
+        if index_file:
+            return Path(index_file).resolve()
+        return Path(self._repo.git_dir) / "index"
+
+    def _load_index(self) -> dict[str, tuple[int, int, int, str]]:
+        """Read the stage-0 index entries in a single batch.
+
+        Entries come from ``git ls-files --debug`` rather than GitPython's
+        index parser, which does not support index version 4.
+        """
+        if self._index is None:
+            self._index = {}
+            try:
+                self._working_tree()
+                index_path = self._index_file()
+                self._index_mtime_ns = index_path.stat().st_mtime_ns
+                output = self._repo.git.ls_files(
+                    "-s", "--debug", "-z", env={"GIT_INDEX_FILE": str(index_path)}
+                )
+                for match in _LS_FILES_ENTRY.finditer(output):
+                    hexsha, stage, path, mtime_s, mtime_ns, size = match.groups()
+                    if stage == "0":
+                        self._index[path] = (int(mtime_s), int(mtime_ns), int(size), hexsha)
+            except (RuntimeError, OSError, git.GitError):
+                # No repository or no index yet: every lookup falls back to disk
+                self._index = {}
+        return self._index
+
+
+class CachedHasher(FileHasher):
+    """File hasher that remembers digests keyed by file stat data.
+
+    A cached digest is reused while the file's mtime, size and inode are
+    unchanged, so repeated checks of untouched files cost one ``stat`` each.
+    Fragment digests are cached the same way, keyed by their file's stat data.
+    With a ``cache_path`` the digests are loaded from and saved to disk, so
+    the cache also carries over between runs.
+    """
+
+    def __init__(
+        self,
+        repo: Optional[git.Repo] = None,
+        ref_cache: Optional[RefCache] = None,
+        cache_path: Optional[Path] = None,
+    ):
+        super().__init__(repo, ref_cache)
+        self._digests: dict[tuple[str, str], tuple[tuple[int, int, int], str]] = {}
+        self._cache_path = cache_path
+        self._dirty = False
+        if cache_path is not None:
+            self._load_digests()
+
+    def hash(self, file_path: Path, algorithm: Optional[str] = None) -> str:
+        """Hash a file, reusing the cached digest if the file is unchanged."""
+        compute = partial(super().hash, file_path, algorithm)
+        return self._cached(str(file_path), file_path, algorithm, compute)
+
+    def fragment_hash(
+        self, file_path: Path, fragment: str, algorithm: Optional[str] = None
+    ) -> Optional[str]:
+        """Hash a fragment, reusing the cached digest if its file is unchanged."""
+        return self._cached(
+            f"{file_path}#{fragment}",
+            file_path,
+            algorithm,
+            partial(super().fragment_hash, file_path, fragment, algorithm),
+        )
+
+    def save(self) -> None:
+        """Write the digests to the cache file if any were added."""
+        if self._cache_path is None or not self._dirty:
+            return
+        entries = [
+            [name, algorithm, *stat_key, digest]
+            for (name, algorithm), (stat_key, digest) in self._digests.items()
+        ]
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._cache_path.write_text(json.dumps(entries, separators=(",", ":")))
+        except OSError:
+            # The cache is an optimization; a read-only tree still works
+            return
+        self._dirty = False
+
+    def _cached(
+        self, name: str, file_path: Path, algorithm: Optional[str], compute
+    ) -> Optional[str]:
+        """Return the cached digest for name while file_path is unchanged, else compute it."""
+        st = file_path.stat()
+        stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cache_key = (name, algorithm or "sha256")
+
+        cached = self._digests.get(cache_key)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+
+        digest = compute()
+        # A file written within the mtime granularity could change again unseen
+        if digest is not None and time.time_ns() - st.st_mtime_ns > RACY_WINDOW_NS:
+            self._digests[cache_key] = (stat_key, digest)
+            self._dirty = True
+        return digest
+
+    def _load_digests(self) -> None:
+        """Read persisted digests, ignoring a missing or unreadable cache file."""
+        try:
+            entries = json.loads(self._cache_path.read_text())
+            for name, algorithm, mtime_ns, size, ino, digest in entries:
+                self._digests[(name, algorithm)] = ((mtime_ns, size, ino), digest)
+        except (OSError, ValueError, TypeError):
+            self._digests.clear()
+
+
+class StagedHasher(FileHasher):
+    """Hash the staged (index) content of files instead of the working tree.
+
+    Used by the pre-commit hooks so the check reflects what is actually being
+    committed. Paths outside the work tree are not versioned and fall back to
+    the working tree.
+    """
+
+    def exists(self, file_path: Path) -> bool:
+        """Return True if the file is staged."""
+        key = self._index_key(file_path)
+        if key is None:
+            return file_path.exists()
+        return key in self._load_index()
+
+    def hash(self, file_path: Path, algorithm: Optional[str] = None) -> str:
+        """Hash the staged content of a file."""
+        key = self._index_key(file_path)
+        if key is None:
+            return super().hash(file_path, algorithm)
+
+        if algorithm == "git-blob":
+            return self._load_index()[key][3]
+        return hash_bytes(self.read(file_path), algorithm)
+
+    def read(self, file_path: Path) -> Optional[bytes]:
+        """Return the staged content of a file, or None if it is not staged."""
+        key = self._index_key(file_path)
+        if key is None:
+            return super().read(file_path)
+
+        entry = self._load_index().get(key)
+        if entry is None:
+            return None
+        return self._repo.odb.stream(bytes.fromhex(entry[3])).read()
+
+    def _content_key(self, file_path: Path) -> object:
+        """Return the staged blob ID, which identifies the staged content."""
+        key = self._index_key(file_path)
+        if key is None:
+            return super()._content_key(file_path)
+        entry = self._load_index().get(key)
+        return entry[3] if entry else None
+
+
+def normalize_path(path: str) -> str:
+    """Normalize a tracked path for lookups (``./docs//a.md#intro`` -> ``docs/a.md``)."""
+    if is_git_ref(path):
+        return path
+    return Path(os.path.normpath(split_fragment(path)[0])).as_posix()
+
+
+def build_path_index(mappings: Iterable[Mapping]) -> dict[str, list[int]]:
+    """Build a reverse index from each tracked path to the mappings using it."""
+    index: dict[str, list[int]] = {}
+    for position, mapping in enumerate(mappings):
+        for path in dict.fromkeys(mapping.inputs + mapping.outputs):
+            index.setdefault(normalize_path(path), []).append(position)
+    return index
+
+
+def impacted_positions(path_index: dict[str, list[int]], paths: Iterable[str]) -> list[int]:
+    """Return the sorted positions of the mappings that use any of the given paths."""
+    positions = set()
+    for path in paths:
+        positions.update(path_index.get(normalize_path(path), []))
+    return sorted(positions)
+
+
+def select_mappings(mappings: list[Mapping], paths: Iterable[str]) -> list[Mapping]:
+    """Return the mappings that use any of the given paths, in tracking order."""
+    positions = impacted_positions(build_path_index(mappings), paths)
+    return [mappings[position] for position in positions]
+
+
+def total_size(paths: Iterable[str]) -> int:
+    """Return the combined size of the existing files among tracked paths.
+
+    Each file counts once however many of its fragments are listed;
+    repository inputs count as zero.
+    """
+    files = {split_fragment(path)[0] for path in paths if not is_git_ref(path)}
+    size = 0
+    for file_name in files:
+        try:
+            size += os.stat(file_name).st_size
+        except OSError:
+            continue
+    return size
+
+
+def record_mapping(
+    data: Optional[TrackingData],
+    inputs: list[str],
+    outputs: list[str],
+    description: str,
+    generator: str = "warp-ai",
+    hash_mode: Optional[str] = None,
+    hasher: Optional[FileHasher] = None,
+    duration: Optional[float] = None,
+) -> tuple[TrackingData, Mapping]:
+    """Add a new mapping to the tracking data, recording it in the history.
+
+    ``data`` may be None to start a new tracking file. Hashes are recorded
+    only when ``hash_mode`` is given. File sizes and hashing time are
+    recorded as metrics, along with the generation ``duration`` in seconds
+    if the generator reports it. The caller is responsible for saving.
+    """
+    hasher = hasher or FileHasher()
+    hasher.prefetch_git_refs(inputs)
+    for input_file in inputs:
+        if is_git_ref(input_file):
+            if hasher.git_ref(input_file) is None:
+                raise ValueError(f"Cannot resolve repository input: {input_file}")
+            continue
+        base, fragment = split_fragment(input_file)
+        if not Path(base).exists():
+            raise ValueError(f"Input file does not exist: {base}")
+        if fragment is not None and not supports_fragments(base):
+            raise ValueError(f"Fragments are not supported for {base}")
+        if fragment is not None and hasher.fragment_hash(Path(base), fragment) is None:
+            raise ValueError(f"Fragment not found: {input_file}")
+
+    commit_id = get_current_commit()
+    timestamp = datetime.now()
+
+    if data is None:
+        data = TrackingData(
+            version="1.0.0",
+            last_generation=Generation(
+                commit_id=commit_id,
+                timestamp=timestamp,
+                generator=generator,
+                mappings=[],
+            ),
+            history=[],
+        )
+
+    # Create new mapping with multiple files
+    mapping = Mapping(inputs=inputs, outputs=outputs, description=description)
+
+    hash_seconds = None
+    if hash_mode is not None:
+        start = time.perf_counter()
+        input_hashes = {}
+        output_hashes = {}
+
+        for input_file in inputs:
+            input_hash = hasher.hash_path(input_file, hash_mode)
+            if input_hash is not None:
+                input_hashes[input_file] = input_hash
+
+        for output_file in outputs:
+            output_hash = hasher.hash_path(output_file, hash_mode)
+            if output_hash is not None:
+                output_hashes[output_file] = output_hash
+
+        if input_hashes:
+            mapping.input_hashes = input_hashes
+        if output_hashes:
+            mapping.output_hashes = output_hashes
+        if hash_mode != "sha256":
+            mapping.hash_algorithm = hash_mode
+        hash_seconds = round(time.perf_counter() - start, 6)
+
+    mapping.metrics = MappingMetrics(
+        duration_seconds=duration,
+        bytes_in=total_size(inputs),
+        bytes_out=total_size(outputs),
+        hash_seconds=hash_seconds,
+    )
+
+    # Add to history
+    change_msg = f"Added mapping: [{', '.join(inputs)}] -> [{', '.join(outputs)}]"
+    data.history.append(
+        HistoryEntry(
+            commit_id=commit_id,
+            timestamp=timestamp,
+            version=data.version,
+            changes=[change_msg],
+        )
+    )
+
+    # Update last generation
+    data.last_generation = Generation(
+        commit_id=commit_id,
+        timestamp=timestamp,
+        generator=generator,
+        mappings=data.last_generation.mappings + [mapping],
+    )
+    return data, mapping
+
+
+def refresh_hashes(
+    data: TrackingData,
+    paths: Optional[Iterable[str]] = None,
+    hasher: Optional[FileHasher] = None,
+    max_workers: int = MAX_HASH_WORKERS,
+    duration: Optional[float] = None,
+) -> tuple[dict[int, list[str]], dict[int, list[str]]]:
+    """Update the stored hashes of regenerated mappings in place.
+
+    Only mappings that record hashes are considered; with ``paths`` only the
+    mappings using any of them. Every input and output of those mappings is
+    rehashed, grouped by file and in parallel, so with a ``CachedHasher``
+    unchanged files cost one ``stat`` each. Repository inputs are resolved
+    again, bypassing the ref cache.
+
+    A mapping counts as regenerated when one of its outputs changed or is
+    named in ``paths``; only then are its hashes, inputs included, updated.
+    A mapping whose inputs changed but whose outputs were not regenerated is
+    stale and left untouched. Files that no longer exist keep their hash.
+
+    The metrics of refreshed mappings are updated: file sizes, hashing time,
+    the generation ``duration`` if given, and the regeneration count. A
+    ``duration`` measures one generator run, so it is only accepted when
+    exactly one mapping is selected; ValueError otherwise.
+
+    Returns the refreshed mappings and the stale ones, each as positions
+    with their changed paths. Refreshed mappings are recorded in a single
+    history entry. The caller saves the data.
+    """
+    hasher = hasher or CachedHasher()
+    mappings = data.last_generation.mappings
+    named: set[str] = set()
+    if paths is None:
+        positions = range(len(mappings))
+    else:
+        paths = list(paths)
+        named = {normalize_path(path) for path in paths}
+        positions = impacted_positions(build_path_index(mappings), paths)
+    selected = [p for p in positions if mappings[p].input_hashes or mappings[p].output_hashes]
+    if duration is not None and len(selected) != 1:
+        raise ValueError(
+            f"--duration applies to a single mapping, but {len(selected)} are selected; "
+            "pass paths that select exactly one mapping"
+        )
+
+    specs = set()
+    groups: dict[tuple[str, str], set[str]] = defaultdict(set)
+    for position in selected:
+        mapping = mappings[position]
+        algorithm = mapping.hash_algorithm or "sha256"
+        for path in mapping.inputs + mapping.outputs:
+            if is_git_ref(path):
+                specs.add(path)
+            else:
+                groups[(split_fragment(path)[0], algorithm)].add(path)
+
+    def hash_group(group: tuple[tuple[str, str], set[str]]) -> tuple[list[tuple], float]:
+        # All fragments of one file are hashed by the same worker, parsing it once
+        (_, algorithm), group_paths = group
+        start = time.perf_counter()
+        results = [((path, algorithm), hasher.hash_path(path, algorithm)) for path in group_paths]
+        return results, time.perf_counter() - start
+
+    digests: dict[tuple[str, str], Optional[str]] = {}
+    group_seconds: dict[tuple[str, str], float] = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+            for group, (results, seconds) in zip(groups, pool.map(hash_group, groups.items())):
+                digests.update(results)
+                group_seconds[group] = seconds
+    refs = resolve_refs(specs, RefCache(ttl=0)) if specs else {}
+
+    refreshed: dict[int, list[str]] = {}
+    stale: dict[int, list[str]] = {}
+    for position in selected:
+        mapping = mappings[position]
+        algorithm = mapping.hash_algorithm or "sha256"
+        updates: dict[str, dict[str, str]] = {}
+        changed = []
+        for field, files in (("input_hashes", mapping.inputs), ("output_hashes", mapping.outputs)):
+            hashes = dict(getattr(mapping, field) or {})
+            for path in files:
+                digest = refs.get(path) if is_git_ref(path) else digests.get((path, algorithm))
+                if digest is not None and hashes.get(path) != digest:
+                    hashes[path] = digest
+                    changed.append(path)
+            updates[field] = hashes
+
+        regenerated = any(path in mapping.outputs for path in changed) or any(
+            normalize_path(path) in named for path in mapping.outputs
+        )
+        if not regenerated:
+            if changed:
+                stale[position] = changed
+            continue
+        if not changed:
+            continue
+
+        refreshed[position] = changed
+        for field, hashes in updates.items():
+            if hashes:
+                setattr(mapping, field, hashes)
+        metrics = mapping.metrics or MappingMetrics()
+        metrics.bytes_in = total_size(mapping.inputs)
+        metrics.bytes_out = total_size(mapping.outputs)
+        bases = {split_fragment(path)[0] for path in mapping.inputs + mapping.outputs}
+        metrics.hash_seconds = round(
+            sum(group_seconds.get((base, algorithm), 0.0) for base in bases), 6
+        )
+        if duration is not None:
+            metrics.duration_seconds = duration
+        metrics.regenerations += 1
+        mapping.metrics = metrics
+
+    if refreshed:
+        commit_id = get_current_commit()
+        timestamp = datetime.now()
+        data.history.append(
+            HistoryEntry(
+                commit_id=commit_id,
+                timestamp=timestamp,
+                version=data.version,
+                changes=[
+                    f"Refreshed hashes: [{', '.join(mappings[p].inputs)}] "
+                    f"-> [{', '.join(mappings[p].outputs)}]"
+                    for p in refreshed
+                ],
+            )
+        )
+        data.last_generation.commit_id = commit_id
+        data.last_generation.timestamp = timestamp
+    return refreshed, stale
+
+
+def refresh_report(
+    data: TrackingData, refreshed: dict[int, list[str]], stale: dict[int, list[str]]
+) -> dict:
+    """Describe the result of ``refresh_hashes`` as a JSON-serializable report."""
+    mappings = data.last_generation.mappings
+
+    def records(changes: dict[int, list[str]]) -> list[dict]:
+        return [
+            {
+                "index": position,
+                "inputs": mappings[position].inputs,
+                "outputs": mappings[position].outputs,
+                "changed": changed,
+            }
+            for position, changed in changes.items()
+        ]
+
+    return {
+        "commit_id": data.last_generation.commit_id,
+        "mappings": records(refreshed),
+        "stale": records(stale),
+    }
+
+
+def parse_tracking_document(content: bytes) -> dict:
+    """Decode a tracking file in either format into a regular JSON document."""
+    document = json.loads(content)
+    return from_compact(document) if is_compact(document) else document
+
+
+def tracking_file_format(tracking_path: Optional[Path] = None) -> str:
+    """Return the on-disk format of a tracking file: ``json`` or ``compact``."""
+    tracking_path = tracking_path or Path(TRACKING_FILE)
+    try:
+        with open(tracking_path, "rb") as f:
+            head = f.read(64)
+    except FileNotFoundError:
+        return "json"
+    # Compact files are written without whitespace and lead with the marker
+    return COMPACT_FORMAT if head.startswith(b'{"format":"compact"') else "json"
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Pause the cyclic garbage collector while building large object graphs.
+
+    Decoding a big tracking file allocates millions of objects without
+    creating cycles; letting the collector scan them repeatedly roughly
+    doubles load time.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
 def load_tracking_data() -> TrackingData:
-    """Load and validate tracking data from file."""
+    """Load and validate tracking data from file, in either format."""
     tracking_path = Path(TRACKING_FILE)
     if not tracking_path.exists():
         raise FileNotFoundError(f"Tracking file not found: {TRACKING_FILE}")
 
-    with open(tracking_path) as f:
-        data = json.load(f)
+    with gc_paused():
+        return TrackingData.model_validate(parse_tracking_document(tracking_path.read_bytes()))
 
-    return TrackingData.model_validate(data)
 
+def save_tracking_data(data: TrackingData, file_format: Optional[str] = None) -> None:
+    """Save tracking data to file.
 
-def save_tracking_data(data: TrackingData) -> None:
-    """Save tracking data to file."""
+    ``file_format`` is ``json`` (pretty-printed, for review) or ``compact``;
+    by default the format of the existing file is kept.
+    """
     tracking_path = Path(TRACKING_FILE)
+    file_format = file_format or tracking_file_format(tracking_path)
+    document = data.model_dump(mode="json", exclude_none=True)
+
     with open(tracking_path, "w") as f:
-        json.dump(data.model_dump(mode="json", exclude_none=True), f, indent=2, default=str)
+        if file_format == COMPACT_FORMAT:
+            json.dump(to_compact(document), f, separators=(",", ":"), default=str)
+        else:
+            json.dump(document, f, indent=2, default=str)
         f.write("\n")
 
 
-def validate_tracking_file() -> tuple[bool, Optional[str]]:
-    """Validate tracking file against JSON schema."""
+def validate_tracking_file(content: Optional[bytes] = None) -> tuple[bool, Optional[str]]:
+    """Validate tracking file against JSON schema.
+
+    ``content`` validates the given bytes (e.g. the staged tracking file)
+    instead of reading the file from disk.
+    """
     try:
         tracking_path = Path(TRACKING_FILE)
         schema_path = Path(SCHEMA_FILE)
 
-        if not tracking_path.exists():
+        if content is None and not tracking_path.exists():
             return False, f"Tracking file not found: {TRACKING_FILE}"
 
         if not schema_path.exists():
             return False, f"Schema file not found: {SCHEMA_FILE}"
 
-        with open(tracking_path) as f:
-            tracking_data = json.load(f)
+        if content is None:
+            content = tracking_path.read_bytes()
+        tracking_data = parse_tracking_document(content)
 
         with open(schema_path) as f:
             schema = json.load(f)
@@ -91,52 +804,212 @@ def validate_tracking_file() -> tuple[bool, Optional[str]]:
         return False, f"Validation error: {e}"
 
 
-def check_files_in_sync() -> tuple[bool, list[str]]:
-    """Check if tracked files are in sync with their recorded hashes.
-    
-    Supports both single and multiple file mappings.
+def _iter_file_issues(
+    role: str,
+    files: list[str],
+    hashes: Optional[dict[str, str]],
+    algorithm: Optional[str],
+    hasher: FileHasher,
+) -> Iterator[SyncIssue]:
+    """Yield issues for the input or output files of a single mapping."""
+    for file_name in files:
+        if is_git_ref(file_name):
+            # Repository inputs are compared by the commit their ref resolves to
+            current_hash = hasher.git_ref(file_name)
+            if current_hash is None:
+                yield SyncIssue(
+                    kind="missing",
+                    role=role,
+                    path=file_name,
+                    message=f"{role.capitalize()} repository ref unresolvable: {file_name}",
+                )
+                continue
+            if hashes and file_name in hashes and current_hash != hashes[file_name]:
+                yield SyncIssue(
+                    kind="modified",
+                    role=role,
+                    path=file_name,
+                    message=(
+                        f"{role.capitalize()} repository ref moved since last generation: "
+                        f"{file_name}"
+                    ),
+                )
+            continue
+
+        base, fragment = split_fragment(file_name)
+        file_path = Path(base)
+
+        if not hasher.exists(file_path):
+            yield SyncIssue(
+                kind="missing",
+                role=role,
+                path=file_name,
+                message=f"{role.capitalize()} file missing: {base}",
+            )
+            continue
+
+        if fragment is not None:
+            current_hash = hasher.fragment_hash(file_path, fragment, algorithm)
+            if current_hash is None:
+                yield SyncIssue(
+                    kind="missing",
+                    role=role,
+                    path=file_name,
+                    message=f"{role.capitalize()} fragment missing: {file_name}",
+                )
+                continue
+        elif hashes and file_name in hashes:
+            current_hash = hasher.hash(file_path, algorithm)
+        else:
+            continue
+
+        # Check hash if available
+        if hashes and file_name in hashes and current_hash != hashes[file_name]:
+            what = "fragment" if fragment is not None else "file"
+            yield SyncIssue(
+                kind="modified",
+                role=role,
+                path=file_name,
+                message=f"{role.capitalize()} {what} modified since last generation: {file_name}",
+            )
+
+
+def iter_mapping_issues(
+    mapping: Mapping, hasher: Optional[FileHasher] = None
+) -> Iterator[SyncIssue]:
+    """Yield sync issues for a single mapping, inputs first."""
+    hasher = hasher or FileHasher()
+    algorithm = mapping.hash_algorithm
+    yield from _iter_file_issues("input", mapping.inputs, mapping.input_hashes, algorithm, hasher)
+    yield from _iter_file_issues(
+        "output", mapping.outputs, mapping.output_hashes, algorithm, hasher
+    )
+
+
+def iter_sync_issues(
+    mappings: Optional[Iterable[Mapping]] = None, hasher: Optional[FileHasher] = None
+) -> Iterator[SyncIssue]:
+    """Lazily yield sync issues as they are found.
+
+    Files are hashed only when the consumer asks for the next issue, so
+    stopping iteration early (fail-fast) skips hashing the remaining files.
+    Without explicit mappings the tracking file is streamed one mapping at
+    a time, never loading ``history``. Errors are reported as a final
+    ``error`` issue rather than raised.
     """
     try:
-        data = load_tracking_data()
-        issues = []
-
-        for mapping in data.last_generation.mappings:
-            # Check all input files
-            for input_file in mapping.inputs:
-                input_path = Path(input_file)
-                
-                if not input_path.exists():
-                    issues.append(f"Input file missing: {input_file}")
-                    continue
-                
-                # Check hash if available
-                if mapping.input_hashes and input_file in mapping.input_hashes:
-                    current_hash = hash_file(input_path)
-                    if current_hash != mapping.input_hashes[input_file]:
-                        issues.append(
-                            f"Input file modified since last generation: {input_file}"
-                        )
-            
-            # Check all output files
-            for output_file in mapping.outputs:
-                output_path = Path(output_file)
-                
-                if not output_path.exists():
-                    issues.append(f"Output file missing: {output_file}")
-                    continue
-                
-                # Check hash if available
-                if mapping.output_hashes and output_file in mapping.output_hashes:
-                    current_hash = hash_file(output_path)
-                    if current_hash != mapping.output_hashes[output_file]:
-                        issues.append(
-                            f"Output file modified since last generation: {output_file}"
-                        )
-
-        return len(issues) == 0, issues
+        hasher = hasher or FileHasher()
+
+        # Resolve every repository input in one concurrent batch up front
+        if mappings is None:
+            hasher.prefetch_git_refs(scan_git_refs(Path(TRACKING_FILE)))
+            mappings = iter_tracking_mappings(Path(TRACKING_FILE))
+        elif isinstance(mappings, list):
+            hasher.prefetch_git_refs(
+                path for mapping in mappings for path in mapping.inputs + mapping.outputs
+            )
+
+        for mapping in mappings:
+            yield from iter_mapping_issues(mapping, hasher)
 
     except Exception as e:
-        return False, [f"Error checking sync: {e}"]
+        yield SyncIssue(kind="error", message=f"Error checking sync: {e}")
+
+
+def check_files_in_sync(fail_fast: bool = False) -> tuple[bool, list[str]]:
+    """Check if tracked files are in sync with their recorded hashes.
+
+    Supports both single and multiple file mappings. With ``fail_fast``
+    checking stops at the first issue.
+    """
+    issues = []
+    for issue in iter_sync_issues():
+        issues.append(str(issue))
+        if fail_fast:
+            break
+
+    return len(issues) == 0, issues
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return the nearest-rank ``q``-th percentile (0-100) of sorted values."""
+    rank = max(1, math.ceil(len(values) * q / 100))
+    return values[rank - 1]
+
+
+def mapping_stats(mappings: list[Mapping], top: int = 5) -> dict:
+    """Summarize mapping metrics as percentiles plus the slowest mappings."""
+    measured = [(position, m.metrics) for position, m in enumerate(mappings) if m.metrics]
+
+    distributions = {}
+    for field in METRIC_FIELDS:
+        values = sorted(
+            value
+            for _, metrics in measured
+            if (value := getattr(metrics, field)) is not None
+        )
+        if values:
+            distributions[field] = {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": values[-1],
+                "total": sum(values),
+            }
+
+    timed = [entry for entry in measured if entry[1].duration_seconds is not None]
+    timed.sort(key=lambda entry: entry[1].duration_seconds, reverse=True)
+    return {
+        "total_mappings": len(mappings),
+        "with_metrics": len(measured),
+        "metrics": distributions,
+        "slowest": [
+            {
+                "index": position,
+                "inputs": mappings[position].inputs,
+                "outputs": mappings[position].outputs,
+                "duration_seconds": metrics.duration_seconds,
+            }
+            for position, metrics in timed[:top]
+        ],
+    }
+
+
+def rebuild_order(mappings: list[Mapping], hasher: Optional[FileHasher] = None) -> list[int]:
+    """Return the positions of out-of-sync mappings, longest generation first.
+
+    Starting the longest rebuilds first shortens the total time when stale
+    mappings are regenerated in parallel. Mappings without a recorded
+    duration come last, in file order.
+    """
+    hasher = hasher or FileHasher()
+    hasher.prefetch_git_refs(path for m in mappings for path in m.inputs + m.outputs)
+    stale = [
+        position
+        for position, mapping in enumerate(mappings)
+        if next(iter_mapping_issues(mapping, hasher), None) is not None
+    ]
+
+    def cost(position: int) -> float:
+        metrics = mappings[position].metrics
+        if metrics is None or metrics.duration_seconds is None:
+            return -1.0
+        return metrics.duration_seconds
+
+    return sorted(stale, key=cost, reverse=True)
+
+
+def summarize_tracking(data: TrackingData) -> dict:
+    """Summarize tracking data as JSON-serializable status fields."""
+    return {
+        "version": data.version,
+        "last_update": data.last_generation.timestamp.isoformat(),
+        "last_commit": data.last_generation.commit_id,
+        "generator": data.last_generation.generator,
+        "total_mappings": len(data.last_generation.mappings),
+        "history_items": len(data.history),
+    }
 
 
 def format_timestamp(dt: datetime) -> str:
@@ -1,13 +1,83 @@
 """Tests for documentation tracking system."""
 
+import asyncio
+import contextlib
+import csv
 import json
+import os
+import subprocess
+import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
 import pytest
+from click.testing import CliRunner
 
-from tracking_manager.models import Generation, HistoryEntry, Mapping, TrackingData
-from tracking_manager.utils import hash_file, validate_tracking_file
+from tracking_manager import utils
+from tracking_manager.cli import cli
+from tracking_manager.compact import from_compact, to_compact
+from tracking_manager.fragments import csv_fragments, markdown_fragments, split_fragment
+from tracking_manager.gitrefs import (
+    RefCache,
+    parse_git_ref,
+    resolve_ref,
+    resolve_refs,
+    scan_git_refs,
+)
+from tracking_manager.models import (
+    Generation,
+    HistoryEntry,
+    Mapping,
+    MappingMetrics,
+    TrackingData,
+)
+from tracking_manager.server import TrackingState, _serve, query, serve
+from tracking_manager.streaming import iter_tracking_mappings
+from tracking_manager.utils import (
+    CachedHasher,
+    FileHasher,
+    StagedHasher,
+    git_blob_id,
+    hash_file,
+    iter_sync_issues,
+    load_tracking_data,
+    mapping_stats,
+    percentile,
+    rebuild_order,
+    record_mapping,
+    refresh_hashes,
+    save_tracking_data,
+    select_mappings,
+    tracking_file_format,
+    validate_tracking_file,
+)
+
+
+def git(cwd: Path, *args: str) -> str:
+    """Run a git command in ``cwd`` and return its stripped stdout."""
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def make_tracking_data(mappings: list[Mapping]) -> TrackingData:
+    """Build minimal tracking data around the given mappings."""
+    return TrackingData(
+        version="1.0.0",
+        last_generation=Generation(
+            commit_id="abc1234",
+            timestamp=datetime(2026, 1, 1),
+            generator="test",
+            mappings=mappings,
+        ),
+        history=[],
+    )
 
 
 class TestModels:
@@ -147,6 +217,117 @@ class TestUtils:
         assert hash1 != hash2
 
 
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """A git repository with one committed file older than the index."""
+    monkeypatch.chdir(tmp_path)
+    git(tmp_path, "init", "-q")
+    doc = tmp_path / "doc.md"
+    doc.write_text("committed\n")
+    os.utime(doc, (1_700_000_000, 1_700_000_000))
+    git(tmp_path, "add", "doc.md")
+    git(tmp_path, "commit", "-qm", "init")
+    return tmp_path
+
+
+class TestGitBlobHashing:
+    """Test git blob-ID hashing backed by the git index."""
+
+    def test_git_blob_id_matches_git(self, repo):
+        """Test that blob IDs match git hash-object."""
+        assert git_blob_id(repo / "doc.md") == git(repo, "hash-object", "doc.md")
+
+    def test_clean_file_read_from_index(self, repo, monkeypatch):
+        """Test that stat-clean files are not read from disk."""
+        monkeypatch.setattr(utils, "git_blob_id", lambda path: pytest.fail("file was read"))
+        expected = git(repo, "rev-parse", "HEAD:doc.md")
+        assert FileHasher().hash(Path("doc.md"), "git-blob") == expected
+
+    def test_dirty_and_untracked_files_are_hashed(self, repo):
+        """Test that modified and untracked files fall back to hashing content."""
+        (repo / "doc.md").write_text("changed\n")
+        (repo / "new.md").write_text("untracked\n")
+        hasher = FileHasher()
+
+        for name in ("doc.md", "new.md"):
+            assert hasher.hash(Path(name), "git-blob") == git(repo, "hash-object", name)
+
+    def test_index_version_4(self, repo, monkeypatch):
+        """Test that a v4 index (feature.manyFiles) is read, not rejected."""
+        (repo / "dir with space").mkdir()
+        (repo / "dir with space" / "é.md").write_text("nested\n")
+        os.utime(repo / "dir with space" / "é.md", (1_700_000_000, 1_700_000_000))
+        git(repo, "add", ".")
+        git(repo, "update-index", "--index-version", "4")
+        monkeypatch.setattr(utils, "git_blob_id", lambda path: pytest.fail("file was read"))
+
+        hasher = FileHasher()
+        for name in ("doc.md", "dir with space/é.md"):
+            assert hasher.hash(Path(name), "git-blob") == git(repo, "rev-parse", f":{name}")
+
+
+class TestStagedChecks:
+    """Test the staged-files-only checks used by the pre-commit hooks."""
+
+    def test_select_mappings_by_path(self):
+        """Test that only mappings using the given paths are selected."""
+        mappings = [
+            Mapping(inputs=["a.csv"], outputs=["a.md"], description="a"),
+            Mapping(inputs=["b.csv"], outputs=["b.md"], description="b"),
+            Mapping(inputs=["a.csv", "c.csv"], outputs=["c.md"], description="c"),
+        ]
+        selected = select_mappings(mappings, ["./a.csv", "unrelated.txt"])
+        assert [m.description for m in selected] == ["a", "c"]
+
+    def test_staged_content_is_checked(self, repo):
+        """Test that the staged blob is hashed, not the working tree file."""
+        staged_hash = hash_file(repo / "doc.md")
+        (repo / "doc.md").write_text("unstaged edit\n")
+        mapping = Mapping(
+            inputs=["doc.md"],
+            outputs=["out.md"],
+            description="Staged",
+            input_hashes={"doc.md": staged_hash},
+        )
+
+        issues = list(iter_sync_issues([mapping], StagedHasher()))
+        assert [(i.kind, i.path) for i in issues] == [("missing", "out.md")]
+        assert [i.kind for i in iter_sync_issues([mapping])] == ["modified", "missing"]
+
+    def test_commit_all_hook_checks_temporary_index(self, repo):
+        """Test the hook of a real `git commit -a`, which stages into a temporary index."""
+        script = Path(__file__).parent.parent / "scripts" / "check_docs_sync.py"
+        hook = repo / ".git" / "hooks" / "pre-commit"
+        hook.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{script}" $(git diff --cached --name-only)\n'
+        )
+        hook.chmod(0o755)
+
+        (repo / "out.md").write_text("generated\n")
+        mapping = Mapping(
+            inputs=["doc.md"],
+            outputs=["out.md"],
+            description="Docs",
+            input_hashes={"doc.md": hash_file(repo / "doc.md")},
+        )
+        save_tracking_data(make_tracking_data([mapping]))
+        git(repo, "add", ".")
+        git(repo, "commit", "-qm", "track")
+        head = git(repo, "rev-parse", "HEAD")
+
+        # The edit is only staged by -a, into the temporary index the hook sees
+        (repo / "doc.md").write_text("edited input\n")
+        with pytest.raises(subprocess.CalledProcessError) as excinfo:
+            git(repo, "commit", "-a", "-m", "stale input")
+        assert "Input file modified" in excinfo.value.stderr
+        assert git(repo, "rev-parse", "HEAD") == head
+
+        git(repo, "checkout", "doc.md")
+        (repo / "out.md").write_text("regenerated\n")
+        git(repo, "commit", "-a", "-m", "regenerated output")
+        assert git(repo, "rev-parse", "HEAD") != head
+
+
 class TestTrackingFile:
     """Test tracking file operations."""
 
@@ -220,7 +401,7 @@ class TestTrackingFile:
             
             for input_file in inputs:
                 if input_file:  # Skip None values
-                    input_path = Path(input_file)
+                    input_path = Path(split_fragment(input_file)[0])
                     assert input_path.exists(), f"Input file should exist: {input_file}"
             
             for output_file in outputs:
@@ -263,3 +444,764 @@ class TestIntegrity:
             pairs.append((inputs, outputs))
         
         assert len(pairs) == len(set(pairs)), "Should not have duplicate mappings"
+
+
+class TestSyncOutput:
+    """Test streaming sync issues and machine-readable CLI output."""
+
+    @pytest.fixture
+    def project(self, tmp_path, monkeypatch):
+        """A project with one in-sync mapping and one stale mapping."""
+        monkeypatch.chdir(tmp_path)
+        for name in ("a.csv", "a.md", "b.csv", "b.md"):
+            Path(name).write_text(name)
+        mappings = [
+            Mapping(
+                inputs=["a.csv"],
+                outputs=["a.md"],
+                description="In sync",
+                input_hashes={"a.csv": hash_file(Path("a.csv"))},
+            ),
+            Mapping(
+                inputs=["b.csv"],
+                outputs=["b.md", "missing.md"],
+                description="Stale",
+                input_hashes={"b.csv": "0" * 64},
+            ),
+        ]
+        save_tracking_data(make_tracking_data(mappings))
+        return mappings
+
+    def test_iter_sync_issues_is_lazy(self, project):
+        """Test that issues are yielded one at a time in mapping order."""
+        issues = iter_sync_issues(project)
+        first = next(issues)
+        assert (first.kind, first.role, first.path) == ("modified", "input", "b.csv")
+        assert [i.kind for i in issues] == ["missing"]
+
+    def test_sync_ndjson(self, project):
+        """Test ndjson output emits one record per issue plus a result."""
+        result = CliRunner().invoke(cli, ["sync", "--format", "ndjson"])
+        records = [json.loads(line) for line in result.output.splitlines()]
+
+        assert result.exit_code == 1
+        assert [r["event"] for r in records] == ["issue", "issue", "result"]
+        assert records[-1] == {"event": "result", "in_sync": False, "issue_count": 2}
+
+    def test_sync_fail_fast(self, project):
+        """Test that --fail-fast stops at the first issue and exits non-zero."""
+        result = CliRunner().invoke(cli, ["sync", "--format", "json", "--fail-fast"])
+        report = json.loads(result.output)
+
+        assert result.exit_code == 1
+        assert report["in_sync"] is False
+        assert [i["path"] for i in report["issues"]] == ["b.csv"]
+
+    def test_status_json_in_sync(self, project):
+        """Test json status output for a clean tree."""
+        save_tracking_data(make_tracking_data(project[:1]))
+        result = CliRunner().invoke(cli, ["status", "--format", "json"])
+        report = json.loads(result.output)
+
+        assert result.exit_code == 0
+        assert report["in_sync"] is True
+        assert report["total_mappings"] == 1
+
+    def test_status_text_fail_fast(self, project):
+        """Test that text status honours --fail-fast and exits non-zero when stale."""
+        result = CliRunner().invoke(cli, ["status", "--fail-fast"])
+
+        assert result.exit_code == 1
+        assert "1 file(s) out of sync" in result.output
+        assert CliRunner().invoke(cli, ["status"]).exit_code == 1
+
+
+class TestFragments:
+    """Test section- and row-level fragment tracking."""
+
+    CATALOG = (
+        "# Catalog\n\n"
+        "## 1. Diagrams\n\n"
+        "### 1.2 Draw.io (diagrams.net)\n\nDraw.io text\n\n"
+        "### 1.3 Mermaid\n\nMermaid text\n\n"
+        "## 2. Schemas\n\n```\n# not a heading\n```\n"
+    )
+    URIS = (
+        "uri;scope\n"
+        "https://github.com/mermaid-js/mermaid.git;diagram\n"
+        "https://publications.opengroup.org/standards;modeling\n"
+    )
+
+    def test_markdown_sections(self):
+        """Test that sections include subsections and skip fenced headings."""
+        sections = markdown_fragments(self.CATALOG)
+        assert "12-drawio-diagramsnet" in sections
+        assert "Mermaid text" in sections["1-diagrams"]
+        assert "Mermaid text" not in sections["12-drawio-diagramsnet"]
+        assert "not-a-heading" not in sections
+
+    def test_csv_rows(self):
+        """Test that each row has one key derived from its repository or domain."""
+        rows = csv_fragments(self.URIS)
+        assert rows == {
+            "mermaid": "https://github.com/mermaid-js/mermaid.git;diagram\n",
+            "opengroup": "https://publications.opengroup.org/standards;modeling\n",
+        }
+
+    def test_ambiguous_csv_key(self):
+        """Test that rows sharing a key are rejected rather than merged."""
+        uris = self.URIS + "https://www.opengroup.org/togaf;framework\n"
+        with pytest.raises(ValueError, match="Ambiguous CSV key 'opengroup' on lines 3 and 4"):
+            csv_fragments(uris)
+
+    def test_deliverable_sources_resolve(self):
+        """Test that every source-input of the deliverables catalog resolves to a row."""
+        inputs = Path(__file__).resolve().parent.parent / "inputs"
+        rows = csv_fragments((inputs / "uri.csv").read_text())
+        with open(inputs / "deliverables.csv", newline="") as f:
+            sources = [row["source-input"] for row in csv.DictReader(f, delimiter=";")]
+
+        fragments = [split_fragment(source)[1] for source in sources]
+        assert [f for f in fragments if f is not None and f not in rows] == []
+
+    def test_mapping_stale_only_when_fragment_changes(self, tmp_path, monkeypatch):
+        """Test that edits outside a consumed fragment keep the mapping in sync."""
+        monkeypatch.chdir(tmp_path)
+        Path("catalog.md").write_text(self.CATALOG)
+        Path("uri.csv").write_text(self.URIS)
+        Path("guide.md").write_text("guide")
+        inputs = ["catalog.md#12-drawio-diagramsnet", "uri.csv#opengroup"]
+        hasher = FileHasher()
+        mapping = Mapping(
+            inputs=inputs,
+            outputs=["guide.md"],
+            description="Fragment mapping",
+            input_hashes={path: hasher.hash_path(path) for path in inputs},
+        )
+
+        Path("catalog.md").write_text(self.CATALOG.replace("Mermaid text", "Edited"))
+        Path("uri.csv").write_text(self.URIS.replace("diagram", "diagrams"))
+        assert list(iter_sync_issues([mapping])) == []
+
+        Path("catalog.md").write_text(self.CATALOG.replace("Draw.io text", "Edited"))
+        issues = list(iter_sync_issues([mapping]))
+        assert [(i.kind, i.path) for i in issues] == [("modified", inputs[0])]
+
+    def test_missing_fragment(self, tmp_path, monkeypatch):
+        """Test that a fragment that no longer exists is reported missing."""
+        monkeypatch.chdir(tmp_path)
+        Path("catalog.md").write_text(self.CATALOG)
+        mapping = Mapping(inputs=["catalog.md#gone"], outputs=["catalog.md"], description="x")
+
+        issues = list(iter_sync_issues([mapping]))
+        assert [(i.kind, i.message) for i in issues] == [
+            ("missing", "Input fragment missing: catalog.md#gone")
+        ]
+
+    def test_track_rejects_unknown_fragment(self, tmp_path, monkeypatch):
+        """Test that tracking a fragment that does not exist fails up front."""
+        monkeypatch.chdir(tmp_path)
+        Path("catalog.md").write_text(self.CATALOG)
+        with pytest.raises(ValueError, match="Fragment not found: catalog.md#typo"):
+            record_mapping(None, ["catalog.md#typo"], ["out.md"], "x", hash_mode="sha256")
+
+
+class TestServer:
+    """Test the long-lived query server."""
+
+    @pytest.fixture
+    def project(self, tmp_path, monkeypatch):
+        """A project with one hashed mapping."""
+        monkeypatch.chdir(tmp_path)
+        Path("in.csv").write_text("data")
+        Path("out.md").write_text("doc")
+        mapping = Mapping(
+            inputs=["in.csv"],
+            outputs=["out.md"],
+            description="Docs",
+            input_hashes={"in.csv": hash_file(Path("in.csv"))},
+        )
+        save_tracking_data(make_tracking_data([mapping]))
+        return tmp_path
+
+    def request(self, state, method, **params):
+        """Dispatch one JSON-lines request and return the decoded response."""
+        line = json.dumps({"id": 7, "method": method, "params": params}).encode()
+        return state.dispatch(line)
+
+    def test_sync_and_impacted(self, project):
+        """Test that queries are answered from the warm state."""
+        state = TrackingState()
+        assert self.request(state, "sync") == {"id": 7, "result": {"in_sync": True, "issues": []}}
+
+        impacted = self.request(state, "impacted", paths=["./in.csv", "other.md"])["result"]
+        assert [m["index"] for m in impacted["mappings"]] == [0]
+
+    def test_state_invalidated_on_change(self, project):
+        """Test that edits to tracked files and the tracking file are picked up."""
+        state = TrackingState()
+        self.request(state, "sync")
+
+        Path("in.csv").write_text("changed data")
+        issues = self.request(state, "sync")["result"]["issues"]
+        assert [i["path"] for i in issues] == ["in.csv"]
+
+        save_tracking_data(make_tracking_data([]))
+        assert self.request(state, "status")["result"]["total_mappings"] == 0
+
+    def test_unknown_method(self, project):
+        """Test that errors are returned as responses, not raised."""
+        assert self.request(TrackingState(), "nope") == {"id": 7, "error": "Unknown method: nope"}
+
+    def test_refuses_to_replace_regular_file(self, project):
+        """Test that a non-socket path is never deleted as a stale socket."""
+        Path("notes.txt").write_text("keep me")
+        with pytest.raises(RuntimeError, match="not a socket"):
+            serve("notes.txt")
+        assert Path("notes.txt").read_text() == "keep me"
+
+    @pytest.fixture
+    def server(self, project):
+        """A server on an event loop the test controls, stopped at teardown."""
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def start() -> asyncio.Task:
+            return asyncio.ensure_future(_serve(TrackingState(), "s.sock"))
+
+        async def stop(task: asyncio.Task) -> None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        task = asyncio.run_coroutine_threadsafe(start(), loop).result()
+        for _ in range(200):
+            if Path("s.sock").exists():
+                break
+            time.sleep(0.01)
+        yield "s.sock"
+
+        asyncio.run_coroutine_threadsafe(stop(task), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        loop.close()
+        assert not Path("s.sock").exists()
+
+    def test_cli_client_mode(self, server):
+        """Test the CLI talking to a server over a Unix socket."""
+        assert query("ping", socket_path=server)["pid"] == os.getpid()
+        result = CliRunner().invoke(cli, ["--socket", server, "sync", "--format", "json"])
+        assert result.exit_code == 0
+        assert json.loads(result.output) == {"in_sync": True, "issues": []}
+
+    def test_cli_client_uses_only_stdlib(self, server):
+        """Test that a query over the socket does not load the tracking modules."""
+        script = (
+            "import sys\n"
+            "from tracking_manager.cli import cli\n"
+            "cli.main(['--socket', 's.sock', 'status'], standalone_mode=False)\n"
+            "heavy = {'pydantic', 'git', 'jsonschema', 'tracking_manager.utils'}\n"
+            "print(sorted(heavy & set(sys.modules)))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+        assert "All files in sync" in result.stdout
+        assert result.stdout.rstrip().endswith("[]")
+
+
+class TestCompactFormat:
+    """Test the compact on-disk tracking format."""
+
+    @pytest.fixture
+    def data(self, tmp_path, monkeypatch):
+        """Tracking data whose paths and hashes repeat across mappings."""
+        monkeypatch.chdir(tmp_path)
+        return make_tracking_data(
+            [
+                Mapping(
+                    inputs=["inputs/uri.csv", "docs/catalog.md#intro"],
+                    outputs=["docs/catalog.md"],
+                    description="First",
+                    input_hashes={"inputs/uri.csv": "a" * 64},
+                    output_hashes={"docs/catalog.md": "b" * 40},
+                    hash_algorithm="git-blob",
+                ),
+                Mapping(inputs=["inputs/uri.csv"], outputs=["docs/other.md"], description="Second"),
+            ]
+        )
+
+    def test_round_trip(self, data):
+        """Test that compact encoding is lossless."""
+        document = data.model_dump(mode="json", exclude_none=True)
+        encoded = to_compact(document)
+
+        assert encoded["paths"] == [
+            "inputs/uri.csv", "docs/catalog.md#intro", "docs/catalog.md", "docs/other.md"
+        ]
+        assert encoded["last_generation"]["mappings"][1]["i"] == [0]
+        assert from_compact(json.loads(json.dumps(encoded))) == document
+
+    def test_load_detects_format(self, data):
+        """Test that both formats load to the same data and saving keeps the format."""
+        save_tracking_data(data, "compact")
+        assert tracking_file_format() == "compact"
+        assert load_tracking_data() == data
+
+        save_tracking_data(load_tracking_data())
+        assert tracking_file_format() == "compact"
+
+        save_tracking_data(data, "json")
+        assert tracking_file_format() == "json"
+        assert load_tracking_data() == data
+
+    def test_migrate_both_ways(self, data):
+        """Test track migrate --to compact|json."""
+        save_tracking_data(data, "json")
+        json_size = Path(".docs-tracking.json").stat().st_size
+
+        result = CliRunner().invoke(cli, ["migrate", "--to", "compact"])
+        assert result.exit_code == 0
+        assert tracking_file_format() == "compact"
+        assert Path(".docs-tracking.json").stat().st_size < json_size
+
+        result = CliRunner().invoke(cli, ["migrate", "--to", "json"])
+        assert result.exit_code == 0
+        assert load_tracking_data() == data
+        assert Path(".docs-tracking.json").stat().st_size == json_size
+
+
+class TestStreamingReader:
+    """Test incremental reading of mappings from large tracking files."""
+
+    @pytest.fixture
+    def data(self, tmp_path, monkeypatch):
+        """Tracking data with awkward strings and a long history."""
+        monkeypatch.chdir(tmp_path)
+        mappings = [
+            Mapping(
+                inputs=[f"in/{i}.csv"],
+                outputs=[f'out/{i} "quoted" [x] {{y}}\\.md'],
+                description=f"Mapping {i} with \\\\ escapes and ünïcode",
+                input_hashes={f"in/{i}.csv": f"{i:064x}"},
+            )
+            for i in range(25)
+        ]
+        data = make_tracking_data(mappings)
+        data.history = [
+            HistoryEntry(
+                commit_id="abc1234",
+                timestamp=datetime(2026, 1, 1),
+                version="1.0.0",
+                changes=[f'change {i}: "{{[' * 3],
+            )
+            for i in range(200)
+        ]
+        return data
+
+    @pytest.mark.parametrize("file_format", ["json", "compact"])
+    @pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+    def test_matches_full_load(self, data, file_format, chunk_size):
+        """Test that streamed mappings equal the fully loaded ones at any chunk size."""
+        save_tracking_data(data, file_format)
+        streamed = list(iter_tracking_mappings(Path(".docs-tracking.json"), chunk_size))
+        assert streamed == data.last_generation.mappings
+
+    def test_history_is_not_decoded(self, data):
+        """Test that history is skipped, even when it would not validate."""
+        document = data.model_dump(mode="json", exclude={"history"}, exclude_none=True)
+        document = {"history": [{"bogus": ["]", "}", "\\"]}], **document}
+        Path(".docs-tracking.json").write_text(json.dumps(document))
+
+        streamed = iter_tracking_mappings(Path(".docs-tracking.json"), chunk_size=16)
+        assert next(streamed) == data.last_generation.mappings[0]
+
+    def test_sync_streams_without_full_load(self, data, monkeypatch):
+        """Test that sync of the tracking file does not load it whole."""
+        save_tracking_data(data)
+        monkeypatch.setattr(utils, "load_tracking_data", lambda: pytest.fail("full load"))
+
+        issues = list(iter_sync_issues())
+        assert len(issues) == 50
+        assert {i.kind for i in issues} == {"missing"}
+
+
+class TestGitRefs:
+    """Test git repository inputs tracked by resolved ref."""
+
+    @pytest.fixture
+    def upstream(self, tmp_path, monkeypatch):
+        """A bare repository with one commit on main, and a clone to push from."""
+        bare = tmp_path / "upstream.git"
+        work = tmp_path / "work"
+        git(tmp_path, "init", "--bare", "-b", "main", str(bare))
+        git(tmp_path, "init", "-b", "main", str(work))
+        (work / "README.md").write_text("v1\n")
+        git(work, "add", "README.md")
+        git(work, "commit", "-m", "v1")
+        git(work, "push", str(bare), "main")
+
+        project = tmp_path / "project"
+        git(tmp_path, "init", "-b", "main", str(project))
+        (project / "out.md").write_text("out\n")
+        git(project, "add", "out.md")
+        git(project, "commit", "-m", "init")
+        monkeypatch.chdir(project)
+        return bare, work
+
+    def push_commit(self, work: Path, bare: Path) -> str:
+        """Push a new commit upstream and return its SHA."""
+        (work / "README.md").write_text("v2\n")
+        git(work, "commit", "-am", "v2")
+        git(work, "push", str(bare), "main")
+        return git(work, "rev-parse", "HEAD")
+
+    def test_parse_git_ref(self):
+        """Test splitting specs into URL and ref."""
+        assert parse_git_ref("git+https://h/r.git@dev") == ("https://h/r.git", "dev")
+        assert parse_git_ref("git+https://h/r.git") == ("https://h/r.git", "HEAD")
+        assert parse_git_ref("git+git@h:r.git") == ("git@h:r.git", "HEAD")
+        assert parse_git_ref("git+git@h:r.git@v1.0") == ("git@h:r.git", "v1.0")
+        assert parse_git_ref("git+ssh://git@github.com/org/repo.git") == (
+            "ssh://git@github.com/org/repo.git",
+            "HEAD",
+        )
+        assert parse_git_ref("git+https://user@host/r.git") == ("https://user@host/r.git", "HEAD")
+        assert parse_git_ref("git+https://user@host/r.git@main") == (
+            "https://user@host/r.git",
+            "main",
+        )
+        assert parse_git_ref("git+ssh://git@host/r.git@feature/x") == (
+            "ssh://git@host/r.git",
+            "feature/x",
+        )
+        assert parse_git_ref("git+/srv/repos/r.git@v2") == ("/srv/repos/r.git", "v2")
+
+    def test_track_records_resolved_commit(self, upstream):
+        """Test that a repository input hashes to the commit its ref points at."""
+        bare, work = upstream
+        spec = f"git+{bare}@main"
+        data, mapping = record_mapping(None, [spec], ["out.md"], "Docs", hash_mode="sha256")
+
+        assert mapping.inputs == [spec]
+        assert mapping.input_hashes == {spec: git(work, "rev-parse", "HEAD")}
+        assert list(iter_sync_issues(data.last_generation.mappings)) == []
+
+    def test_moved_ref_is_reported(self, upstream):
+        """Test that sync reports a ref that moved upstream once the cache expires."""
+        bare, work = upstream
+        spec = f"git+{bare}@main"
+        data, _ = record_mapping(None, [spec], ["out.md"], "Docs", hash_mode="sha256")
+        self.push_commit(work, bare)
+
+        # Still within the TTL: the cached resolution is trusted
+        assert list(iter_sync_issues(data.last_generation.mappings)) == []
+
+        hasher = FileHasher(ref_cache=RefCache(ttl=0))
+        issues = list(iter_sync_issues(data.last_generation.mappings, hasher))
+        assert [(i.kind, i.path) for i in issues] == [("modified", spec)]
+
+    def test_unresolvable_ref(self, upstream):
+        """Test that unknown refs and remotes are reported, and rejected by track."""
+        bare, _ = upstream
+        missing_ref = f"git+{bare}@no-such-branch"
+        missing_remote = f"git+{bare.parent / 'nowhere.git'}"
+        mappings = [
+            Mapping(inputs=[missing_ref, missing_remote], outputs=["out.md"], description="x")
+        ]
+
+        issues = list(iter_sync_issues(mappings))
+        assert [(i.kind, i.path) for i in issues] == [
+            ("missing", missing_ref),
+            ("missing", missing_remote),
+        ]
+        with pytest.raises(ValueError, match="Cannot resolve"):
+            record_mapping(None, [missing_ref], ["out.md"], "x")
+
+    def test_refs_are_resolved_concurrently_and_cached(self, upstream, monkeypatch):
+        """Test that one batch resolves each spec once and the cache is reused."""
+        bare, work = upstream
+        specs = [f"git+{bare}@main", f"git+{bare}@{git(work, 'rev-parse', 'HEAD')}"]
+        calls = []
+        for name in ("GIT_SSH_COMMAND", "GIT_SSH", "GIT_CONFIG_COUNT"):
+            monkeypatch.delenv(name, raising=False)
+
+        def ls_remote(self, url, ref, env=None, kill_after_timeout=None):
+            calls.append(ref)
+            # Never prompt for credentials, never hang
+            assert env["GIT_TERMINAL_PROMPT"] == "0"
+            assert env["GIT_SSH_COMMAND"] == "ssh -o BatchMode=yes"
+            assert kill_after_timeout
+            return subprocess.run(
+                ["git", "ls-remote", url, ref], capture_output=True, text=True, check=True
+            ).stdout
+
+        monkeypatch.setattr("git.Git.ls_remote", ls_remote, raising=False)
+        first = resolve_refs(specs + specs)
+        second = resolve_refs(specs)
+
+        assert first == second
+        # Full SHAs need no lookup; the branch is looked up once, then cached
+        assert calls == ["main"]
+
+    @pytest.mark.parametrize(
+        "variables",
+        [
+            {"GIT_SSH_COMMAND": "ssh -i deploy_key"},
+            {"GIT_SSH": "/usr/local/bin/ssh-wrapper"},
+            {
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "core.sshCommand",
+                "GIT_CONFIG_VALUE_0": "ssh -i deploy_key",
+            },
+        ],
+    )
+    def test_configured_ssh_command_is_kept(self, upstream, monkeypatch, variables):
+        """Test that a user-chosen SSH command is not overridden."""
+        bare, _ = upstream
+        for name in ("GIT_SSH_COMMAND", "GIT_SSH", "GIT_CONFIG_COUNT"):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in variables.items():
+            monkeypatch.setenv(name, value)
+        envs = []
+
+        def ls_remote(self, url, ref, env=None, kill_after_timeout=None):
+            envs.append(env)
+            return ""
+
+        monkeypatch.setattr("git.Git.ls_remote", ls_remote, raising=False)
+        assert resolve_ref(str(bare), "main") is None
+        assert envs == [{"GIT_TERMINAL_PROMPT": "0"}]
+
+    def test_scan_git_refs(self, tmp_path):
+        """Test finding specs in a tracking file across chunk boundaries."""
+        mappings = [
+            Mapping(
+                inputs=[f"git+https://h/r{i}.git@main", "a.csv"], outputs=["o.md"], description="x"
+            )
+            for i in range(5)
+        ]
+        path = tmp_path / "t.json"
+        path.write_text(make_tracking_data(mappings).model_dump_json(indent=2))
+        expected = {f"git+https://h/r{i}.git@main" for i in range(5)}
+        for chunk_size in (3, 17, 4096):
+            assert scan_git_refs(path, chunk_size) == expected
+
+
+class TestRefresh:
+    """Test updating stored hashes in place after regeneration."""
+
+    @pytest.fixture
+    def project(self, repo):
+        """Two hashed mappings, one of them on a Markdown section, and an unhashed one."""
+        for name, text in (("a.csv", "a"), ("b.md", "# Intro\nold\n# Other\n"), ("out.md", "out")):
+            (repo / name).write_text(text)
+            os.utime(repo / name, (1_700_000_000, 1_700_000_000))
+        data, _ = record_mapping(None, ["a.csv"], ["out.md"], "A", hash_mode="sha256")
+        data, _ = record_mapping(data, ["b.md#intro"], ["gen.md"], "B", hash_mode="sha256")
+        data, _ = record_mapping(data, ["a.csv"], ["plain.md"], "Unhashed")
+        return data
+
+    def regenerate(self, name: str, text: str) -> None:
+        """Rewrite a file as a generator would, outside the racy window."""
+        Path(name).write_text(text)
+        os.utime(name, (1_700_000_100, 1_700_000_100))
+
+    def test_updates_hashes_in_place(self, project):
+        """Test that changed hashes are updated without adding mappings."""
+        history = len(project.history)
+        self.regenerate("out.md", "regenerated")
+        self.regenerate("gen.md", "generated later")
+
+        refreshed, stale = refresh_hashes(project)
+
+        assert refreshed == {0: ["out.md"], 1: ["gen.md"]}
+        assert stale == {}
+        mappings = project.last_generation.mappings
+        assert len(mappings) == 3
+        assert mappings[0].output_hashes == {"out.md": hash_file(Path("out.md"))}
+        # An output missing when the mapping was tracked gets its first hash
+        assert mappings[1].output_hashes == {"gen.md": hash_file(Path("gen.md"))}
+        assert mappings[2].input_hashes is None
+        assert len(project.history) == history + 1
+        assert len(project.history[-1].changes) == 2
+        assert list(iter_sync_issues(mappings[:2])) == []
+
+    def test_nothing_changed(self, project):
+        """Test that an up-to-date file gets no history entry."""
+        history = len(project.history)
+        assert refresh_hashes(project) == ({}, {})
+        assert len(project.history) == history
+
+    def test_edited_inputs_stay_stale(self, project):
+        """Test that input hashes are only refreshed once the outputs are regenerated."""
+        stored = project.last_generation.mappings[1].input_hashes
+        self.regenerate("a.csv", "new a")
+        self.regenerate("b.md", "# Intro\nnew\n")
+
+        assert refresh_hashes(project) == ({}, {0: ["a.csv"], 1: ["b.md#intro"]})
+        assert project.last_generation.mappings[1].input_hashes == stored
+        assert [i.path for i in iter_sync_issues(project.last_generation.mappings[:2])] == [
+            "a.csv",
+            "b.md#intro",
+            "gen.md",
+        ]
+
+        self.regenerate("gen.md", "regenerated")
+        assert refresh_hashes(project, ["b.md"]) == ({1: ["b.md#intro", "gen.md"]}, {})
+        assert project.last_generation.mappings[0].input_hashes["a.csv"] != hash_file(Path("a.csv"))
+
+    def test_named_output_counts_as_regenerated(self, project):
+        """Test that naming an output refreshes its mapping even if it came out identical."""
+        self.regenerate("a.csv", "new a")
+
+        assert refresh_hashes(project, ["out.md"]) == ({0: ["a.csv"]}, {})
+        assert list(iter_sync_issues(project.last_generation.mappings[:1])) == []
+
+    def test_unchanged_files_not_read_with_persisted_cache(self, project, monkeypatch):
+        """Test that a second run reads only the files changed since the first."""
+        cache_path = Path(".docs-tracking-cache/stat-cache.json")
+        hasher = CachedHasher(cache_path=cache_path)
+        refresh_hashes(project, hasher=hasher)
+        hasher.save()
+
+        self.regenerate("out.md", "regenerated")
+        read = []
+        real_hash_file = utils.hash_file
+        monkeypatch.setattr(
+            utils, "hash_file", lambda path: read.append(str(path)) or real_hash_file(path)
+        )
+        monkeypatch.setattr(FileHasher, "read", lambda self, path: pytest.fail(f"{path} parsed"))
+
+        hasher = CachedHasher(cache_path=cache_path)
+        assert refresh_hashes(project, hasher=hasher) == ({0: ["out.md"]}, {})
+        assert read == ["out.md"]
+
+    def test_cli_refresh(self, project):
+        """Test the refresh command end to end."""
+        save_tracking_data(project)
+        self.regenerate("out.md", "regenerated")
+
+        result = CliRunner().invoke(cli, ["refresh", "--format", "json"])
+        assert result.exit_code == 0, result.output
+        assert [m["changed"] for m in json.loads(result.output)["mappings"]] == [["out.md"]]
+        assert len(load_tracking_data().last_generation.mappings) == 3
+
+        result = CliRunner().invoke(cli, ["refresh"])
+        assert "up to date" in result.output
+
+        self.regenerate("a.csv", "edited, not regenerated")
+        result = CliRunner().invoke(cli, ["refresh"])
+        assert result.exit_code == 0
+        assert "Not refreshed, outputs not regenerated" in result.output
+        assert CliRunner().invoke(cli, ["sync"]).exit_code == 1
+
+
+class TestMetrics:
+    """Test per-mapping generation metrics."""
+
+    def timed_mappings(self, durations: list) -> list[Mapping]:
+        """Mappings on missing files with the given generation durations."""
+        return [
+            Mapping(
+                inputs=[f"in{i}.csv"],
+                outputs=[f"out{i}.md"],
+                description=f"M{i}",
+                metrics=None if d is None else MappingMetrics(duration_seconds=d, bytes_out=i),
+            )
+            for i, d in enumerate(durations)
+        ]
+
+    def test_captured_by_track_and_refresh(self, repo):
+        """Test that track records sizes and timing, and refresh counts regenerations."""
+        Path("in.csv").write_text("12345")
+        Path("out.md").write_text("abc")
+        data, mapping = record_mapping(
+            None, ["in.csv"], ["out.md", "later.md"], "Docs", hash_mode="sha256", duration=4.2
+        )
+        assert mapping.metrics.bytes_in == 5
+        assert mapping.metrics.bytes_out == 3
+        assert mapping.metrics.duration_seconds == 4.2
+        assert mapping.metrics.hash_seconds >= 0
+        assert mapping.metrics.regenerations == 0
+
+        Path("out.md").write_text("abcdef")
+        refresh_hashes(data, duration=1.5)
+        metrics = data.last_generation.mappings[0].metrics
+        assert metrics.regenerations == 1
+        assert metrics.duration_seconds == 1.5
+        assert (metrics.bytes_in, metrics.bytes_out) == (5, 6)
+
+        # An edited input without regenerated outputs leaves the metrics alone
+        before = metrics.model_copy()
+        Path("in.csv").write_text("changed input")
+        assert refresh_hashes(data) == ({}, {0: ["in.csv"]})
+        assert metrics == before
+
+        Path("out.md").write_text("abcdefgh")
+        refresh_hashes(data)
+        assert metrics.regenerations == 2
+        assert (metrics.bytes_in, metrics.bytes_out) == (13, 8)
+
+    def test_duration_needs_a_single_mapping(self, repo):
+        """Test that one duration is never stamped on several mappings."""
+        for name in ("a.md", "b.md", "c.md"):
+            Path(name).write_text(name)
+        data, _ = record_mapping(None, ["a.md"], ["b.md"], "B", hash_mode="sha256")
+        data, _ = record_mapping(data, ["a.md"], ["c.md"], "C", hash_mode="sha256")
+        Path("b.md").write_text("regenerated")
+        Path("c.md").write_text("regenerated")
+
+        for paths in (None, ["a.md"]):
+            with pytest.raises(ValueError, match="single mapping"):
+                refresh_hashes(data, paths, duration=2.0)
+        assert all(m.metrics.duration_seconds is None for m in data.last_generation.mappings)
+
+        refresh_hashes(data, ["b.md"], duration=2.0)
+        assert [m.metrics.duration_seconds for m in data.last_generation.mappings] == [2.0, None]
+
+    def test_stats(self):
+        """Test percentiles and the slowest mappings."""
+        mappings = self.timed_mappings([1.0, None, 30.0, 2.0, 10.0])
+        stats = mapping_stats(mappings, top=2)
+
+        assert stats["with_metrics"] == 4
+        assert stats["metrics"]["duration_seconds"]["p50"] == 2.0
+        assert stats["metrics"]["duration_seconds"]["max"] == 30.0
+        assert stats["metrics"]["bytes_out"]["total"] == 0 + 2 + 3 + 4
+        assert [m["index"] for m in stats["slowest"]] == [2, 4]
+        assert [percentile([1, 2, 3, 4], q) for q in (25, 50, 90, 100)] == [1, 2, 4, 4]
+
+    def test_rebuild_order_longest_first(self, tmp_path, monkeypatch):
+        """Test that stale mappings are ordered by duration, unknown durations last."""
+        monkeypatch.chdir(tmp_path)
+        mappings = self.timed_mappings([1.0, None, 30.0, 2.0])
+        Path("in3.csv").write_text("x")
+        Path("out3.md").write_text("x")
+        assert rebuild_order(mappings) == [2, 0, 1]
+
+    @pytest.mark.parametrize("file_format", ["json", "compact"])
+    def test_round_trips(self, tmp_path, monkeypatch, file_format):
+        """Test that metrics survive saving, loading and streaming in both formats."""
+        (tmp_path / "schema").mkdir()
+        (tmp_path / utils.SCHEMA_FILE).write_text(Path(utils.SCHEMA_FILE).read_text())
+        monkeypatch.chdir(tmp_path)
+        data = make_tracking_data(self.timed_mappings([1.5, None]))
+        save_tracking_data(data, file_format)
+
+        assert load_tracking_data() == data
+        streamed = list(iter_tracking_mappings(Path(".docs-tracking.json")))
+        assert streamed == data.last_generation.mappings
+        assert validate_tracking_file() == (True, None)
+
+    def test_cli_stats(self, tmp_path, monkeypatch):
+        """Test the stats command's JSON output."""
+        monkeypatch.chdir(tmp_path)
+        save_tracking_data(make_tracking_data(self.timed_mappings([5.0, 7.0])))
+
+        result = CliRunner().invoke(cli, ["stats", "--format", "json", "--top", "1"])
+        assert result.exit_code == 0, result.output
+        output = json.loads(result.output)
+        assert [m["index"] for m in output["slowest"]] == [1]
+        assert [m["index"] for m in output["rebuild_order"]] == [1, 0]